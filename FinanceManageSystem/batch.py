@@ -0,0 +1,21 @@
+"""
+批量详情接口（get_account_details_batch、get_budget_details_batch）共用的参数校验与缓存键。
+"""
+import hashlib
+
+# 单次最多查询的记录数
+DETAILS_BATCH_LIMIT = 100
+
+
+def parse_ids(ids):
+    # 校验 ID 列表并去重，保持请求中的顺序；格式不正确时返回 None
+    if not isinstance(ids, list) or not 0 < len(ids) <= DETAILS_BATCH_LIMIT:
+        return None
+    if not all(isinstance(value, int) and not isinstance(value, bool) for value in ids):
+        return None
+    return list(dict.fromkeys(ids))
+
+
+def ids_key(ids):
+    # 最多 100 个 ID 直接拼进缓存键会超过 Memcached 250 字符的键长限制，取摘要作为键的一部分
+    return hashlib.sha256(','.join(map(str, ids)).encode()).hexdigest()
@@ -0,0 +1,165 @@
+"""
+按用户划分的接口读缓存。
+
+每个用户有一个版本号，缓存键中包含该版本号；任何写接口调用 bump_version 后，
+该用户的所有旧缓存键都不再被读取，从而保证读到的数据不会过期。
+
+版本号只在处理写请求的进程中递增，多进程部署必须把 API_CACHE_ALIAS 指向共享后端；
+别名指向进程内缓存且未设置 API_CACHE_ALLOW_LOCAL 时不缓存接口数据，也不生成 ETag。
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _cache():
+    return caches[settings.API_CACHE_ALIAS]
+
+
+def _in_process():
+    # 进程内缓存不涉及 IO，异步代码中直接同步调用，避免 aget/aset 默认的线程切换
+    return isinstance(_cache(), LocMemCache)
+
+
+def _enabled():
+    # 进程内缓存的版本号无法在其他进程中失效，未显式允许时不启用，见 settings.API_CACHE_ALIAS
+    return not _in_process() or settings.API_CACHE_ALLOW_LOCAL
+
+
+def _version_key(user_id):
+    return f'api:version:{user_id}'
+
+
+def get_version(user_id):
+    cache = _cache()
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        # 版本号被淘汰或进程重启后以当前时间重新初始化，保证不会与旧版本号重复
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+async def aget_version(user_id):
+    if _in_process():
+        return get_version(user_id)
+    cache = _cache()
+    key = _version_key(user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump_version(user_id):
+    if not _enabled():
+        return
+    cache = _cache()
+    try:
+        cache.incr(_version_key(user_id))
+    except ValueError:
+        # 版本号不存在时直接初始化为新值
+        cache.set(_version_key(user_id), time.time_ns(), None)
+
+
+def get_or_build(user_id, name, build, *parts):
+    if not _enabled():
+        return build()
+    # 缓存键：用户 + 版本号 + 接口名 + 参数
+    key = ':'.join(['api', str(user_id), str(get_version(user_id)), name, *map(str, parts)])
+    cache = _cache()
+    payload = cache.get(key)
+    if payload is None:
+        _record('misses')
+        payload = build()
+        cache.set(key, payload, settings.API_CACHE_TIMEOUT)
+    else:
+        _record('hits')
+    return payload
+
+
+async def aget_or_build(user_id, name, build, *parts):
+    # get_or_build 的异步版本，build 为协程函数
+    if not _enabled():
+        return await build()
+    key = ':'.join(['api', str(user_id), str(await aget_version(user_id)), name, *map(str, parts)])
+    cache = _cache()
+    in_process = _in_process()
+    payload = cache.get(key) if in_process else await cache.aget(key)
+    if payload is None:
+        _record('misses')
+        payload = await build()
+        if in_process:
+            cache.set(key, payload, settings.API_CACHE_TIMEOUT)
+        else:
+            await cache.aset(key, payload, settings.API_CACHE_TIMEOUT)
+    else:
+        _record('hits')
+    return payload
+
+
+def _etag(name, user_id, version, query_string):
+    query = hashlib.md5(query_string.encode()).hexdigest()
+    return f'{name}-{user_id}-{version}-{query}'
+
+
+def user_etag(name):
+    """
+    生成供 django.views.decorators.http.condition 使用的 etag_func。
+
+    ETag 由用户版本号和查询参数得出，无需序列化响应内容即可判断数据是否变化；
+    接口缓存未启用时不生成 ETag。
+    """
+    def etag_func(request, *args, **kwargs):
+        if not _enabled() or not request.user.is_authenticated:
+            return None
+        return _etag(name, request.user.id, get_version(request.user.id), request.META.get('QUERY_STRING', ''))
+    return etag_func
+
+
+def async_user_etag(name):
+    """
+    异步视图的条件请求装饰器，行为与 condition(etag_func=user_etag(name)) 相同。
+
+    condition 的 etag_func 只能同步执行，在异步视图中访问 request.user 会触发同步查询，
+    这里改用 request.auser() 和异步缓存接口。
+    """
+    def decorator(func):
+        @wraps(func)
+        async def inner(request, *args, **kwargs):
+            etag = None
+            user = await request.auser() if _enabled() else None
+            if user is not None and user.is_authenticated:
+                version = await aget_version(user.id)
+                etag = quote_etag(_etag(name, user.id, version, request.META.get('QUERY_STRING', '')))
+                response = get_conditional_response(request, etag=etag)
+                if response is not None:
+                    return response
+            response = await func(request, *args, **kwargs)
+            if etag and request.method in ('GET', 'HEAD'):
+                response.headers.setdefault('ETag', etag)
+            return response
+        return inner
+    return decorator
+
+
+def _record(counter):
+    with _stats_lock:
+        _stats[counter] += 1
+
+
+def get_stats():
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,63 @@
+"""
+进程内的请求指标直方图，由 RequestMetricsMiddleware 写入，staff 接口读取。
+"""
+import bisect
+import threading
+
+# 请求总耗时直方图的桶上限（毫秒），最后一个桶收集超出上限的请求
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _new_entry():
+    return {
+        "count": 0,
+        "sql_count": 0,
+        "sql_ms": 0.0,
+        "view_ms": 0.0,
+        "total_ms": 0.0,
+        "response_bytes": 0,
+        "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+    }
+
+
+def record(url_name, sql_count, sql_ms, view_ms, total_ms, response_bytes):
+    with _lock:
+        entry = _metrics.get(url_name)
+        if entry is None:
+            entry = _metrics[url_name] = _new_entry()
+        entry["count"] += 1
+        entry["sql_count"] += sql_count
+        entry["sql_ms"] += sql_ms
+        entry["view_ms"] += view_ms
+        entry["total_ms"] += total_ms
+        entry["response_bytes"] += response_bytes
+        entry["buckets"][bisect.bisect_left(LATENCY_BUCKETS_MS, total_ms)] += 1
+
+
+def snapshot():
+    # 返回每个 URL 名称的平均值与总耗时直方图
+    with _lock:
+        items = [(name, dict(entry, buckets=list(entry["buckets"]))) for name, entry in _metrics.items()]
+
+    result = {}
+    for name, entry in items:
+        count = entry["count"]
+        bounds = [f'le_{bound}' for bound in LATENCY_BUCKETS_MS] + ['inf']
+        result[name] = {
+            "count": count,
+            "avg_sql_count": round(entry["sql_count"] / count, 2),
+            "avg_sql_ms": round(entry["sql_ms"] / count, 3),
+            "avg_view_ms": round(entry["view_ms"] / count, 3),
+            "avg_total_ms": round(entry["total_ms"] / count, 3),
+            "avg_response_bytes": round(entry["response_bytes"] / count),
+            "total_ms_histogram": dict(zip(bounds, entry["buckets"])),
+        }
+    return result
+
+
+def reset():
+    with _lock:
+        _metrics.clear()
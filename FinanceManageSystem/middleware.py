@@ -0,0 +1,171 @@
+import hashlib
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import JsonResponse
+from django.utils.module_loading import import_string
+
+from . import metrics, ratelimit
+
+
+class RequestMetricsMiddleware:
+    """
+    记录每个请求的 SQL 次数、SQL 耗时、视图耗时和响应大小，按 URL 名称汇总到进程内直方图，
+    并通过 Server-Timing 响应头返回。
+
+    需要设置 REQUEST_METRICS_ENABLED = True 才会启用；未启用时抛出 MiddlewareNotUsed，
+    Django 会把该中间件从调用链中移除，不产生任何开销。流式响应在中间件返回后才执行的查询不计入。
+    同时支持同步和异步调用链，ASGI 下异步视图仍在事件循环中执行，不会为适配本中间件而切换线程。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'REQUEST_METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # 异步调用链中 Django 会把同步的 process_view 放到线程中执行，这里换成协程版本
+            self.process_view = self._aprocess_view
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        sql = _SqlTimer()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            _time_queries(stack, sql)
+            request._metrics_view_start = None
+            response = self.get_response(request)
+        return self._record(request, response, sql, start)
+
+    async def __acall__(self, request):
+        sql = _SqlTimer()
+        start = time.perf_counter()
+        # ORM 查询在线程敏感的同步线程中执行，计时器需要装到该线程的数据库连接上
+        stack = ExitStack()
+        await sync_to_async(_time_queries)(stack, sql)
+        try:
+            request._metrics_view_start = None
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self._record(request, response, sql, start)
+
+    def _record(self, request, response, sql, start):
+        total_ms = (time.perf_counter() - start) * 1000
+
+        view_start = request._metrics_view_start
+        view_ms = (time.perf_counter() - view_start) * 1000 if view_start is not None else 0.0
+        response_bytes = 0 if response.streaming else len(response.content)
+        match = request.resolver_match
+        url_name = (match.view_name if match else None) or 'unresolved'
+
+        metrics.record(url_name, sql.count, sql.ms, view_ms, total_ms, response_bytes)
+        response.headers['Server-Timing'] = (
+            f'sql;dur={sql.ms:.3f};desc="{sql.count} queries", '
+            f'view;dur={view_ms:.3f}, total;dur={total_ms:.3f}'
+        )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_view_start = time.perf_counter()
+
+
+class RateLimitMiddleware:
+    """
+    按 settings.RATE_LIMITS 对指定 URL 名称做令牌桶限流，超限返回 429 并带 Retry-After 响应头。
+
+    限流在 process_view 中完成，早于视图解析 JSON 和访问数据库；用户维度按会话 Cookie 的哈希计数，
+    不加载会话和用户对象（会话存在数据库中时读取会话本身就要一次查询）。同一用户的多个会话分别计数，
+    更换 Cookie 绕过用户维度的请求仍受 IP 维度限制。RATE_LIMIT_ENABLED 为 False 或未配置任何限额时不启用。
+    同时支持同步和异步调用链，ASGI 下不会为适配本中间件而切换线程。
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RATE_LIMIT_ENABLED', False) or not getattr(settings, 'RATE_LIMITS', None):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+            # 异步调用链中 Django 会把同步的 process_view 放到线程中执行，这里换成协程版本
+            self.process_view = self._aprocess_view
+        # URL 名称 -> [(维度, 容量, 每秒补充令牌数)]
+        self.limits = {
+            url_name: [(scope, *ratelimit.parse_rate(rate)) for scope, rate in scopes.items()]
+            for url_name, scopes in settings.RATE_LIMITS.items()
+        }
+        self.store = import_string(settings.RATE_LIMIT_STORE)(**getattr(settings, 'RATE_LIMIT_STORE_OPTIONS', {}))
+        self.ip_header = getattr(settings, 'RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        return self._limit(request)
+
+    async def _aprocess_view(self, request, view_func, view_args, view_kwargs):
+        # 进程内令牌桶不涉及 IO，直接调用；共享存储的读写放到线程中执行，避免阻塞事件循环
+        if isinstance(self.store, ratelimit.LocalBucketStore):
+            return self._limit(request)
+        return await sync_to_async(self._limit)(request)
+
+    def _limit(self, request):
+        url_name = request.resolver_match.url_name
+        limits = self.limits.get(url_name)
+        if not limits:
+            return None
+        for scope, capacity, refill_rate in limits:
+            if scope == 'user':
+                session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+                if not session_key:
+                    continue
+                ident = hashlib.sha256(session_key.encode()).hexdigest()
+            else:
+                ident = request.META.get(self.ip_header, '')
+            wait = self.store.take(f'{url_name}:{scope}:{ident}', capacity, refill_rate)
+            if wait:
+                response = JsonResponse({
+                    "code": 429,
+                    "message": "请求过于频繁，请稍后再试",
+                    "data": {"retry_after": wait}
+                }, status=429)
+                response.headers['Retry-After'] = str(wait)
+                return response
+        return None
+
+
+def _time_queries(stack, sql):
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(sql))
+
+
+class _SqlTimer:
+    def __init__(self):
+        self.count = 0
+        self.ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.ms += (time.perf_counter() - start) * 1000
@@ -0,0 +1,8 @@
+from decimal import Decimal
+
+CENT = Decimal('0.01')
+
+
+def money(value):
+    # SQLite 的聚合结果可能丢失小数位（或为浮点数），统一转换为保留两位小数的 Decimal；None 视为 0
+    return Decimal(value or 0).quantize(CENT)
@@ -0,0 +1,74 @@
+"""
+写接口的令牌桶限流。
+
+每个 (URL 名称, 维度, 标识) 对应一个令牌桶，维度为 user（会话中的用户 ID）或 ip。
+桶容量为周期内允许的请求数，令牌按 容量/周期 的速率匀速补充；每次请求只读写一个桶的
+两个数值，开销为 O(1)。桶状态保存在可替换的存储中：LocalBucketStore 为进程内存储，
+多进程部署时可换成基于共享缓存（如 Redis、Memcached）的 CacheBucketStore。
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """把 '60/m' 形式的限额解析为 (容量, 每秒补充的令牌数)。"""
+    count, _, period = rate.partition('/')
+    count = int(count)
+    if count <= 0 or period not in PERIODS:
+        raise ValueError(f'无效的限流配置: {rate!r}')
+    return count, count / PERIODS[period]
+
+
+def take(state, capacity, refill_rate, now):
+    """
+    按令牌桶算法尝试取一个令牌。state 为 (剩余令牌, 上次更新时间) 或 None（满桶）。
+
+    返回 (新的 state, 需要等待的秒数)，等待秒数为 0 表示放行。
+    """
+    tokens, updated = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + (now - updated) * refill_rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), max(1, math.ceil((1 - tokens) / refill_rate))
+
+
+class LocalBucketStore:
+    """进程内令牌桶存储，按最近使用淘汰，最多保留 max_keys 个桶。"""
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, refill_rate):
+        with self._lock:
+            state, wait = take(self._buckets.get(key), capacity, refill_rate, time.monotonic())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class CacheBucketStore:
+    """
+    基于 Django 缓存的令牌桶存储，供多进程共享。读取与写回不是原子操作，
+    并发请求可能多放行少量请求，用于防止失控的客户端已经足够。
+    """
+
+    def __init__(self, alias='default', prefix='ratelimit'):
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def take(self, key, capacity, refill_rate):
+        cache_key = f'{self.prefix}:{key}'
+        state, wait = take(self.cache.get(cache_key), capacity, refill_rate, time.time())
+        # 桶补满所需时间后键自然过期，过期即视为满桶
+        self.cache.set(cache_key, state, timeout=math.ceil(capacity / refill_rate))
+        return wait
@@ -0,0 +1,50 @@
+"""
+各 JSON 视图共用的行序列化工具。
+
+RowSerializer 将响应字段映射到 ORM 列路径，关联表的字段（如 account__accountname）
+通过 values() 在同一条 JOIN 查询中取回，直接把行转换为 dict 而不实例化模型，
+查询次数不随记录条数增长。
+"""
+
+
+class RowSerializer:
+    def __init__(self, fields, decimal_fields=(), datetime_fields=()):
+        # 响应字段名 -> ORM 列路径
+        self.fields = dict(fields)
+        # 需要转成字符串返回的 Decimal 字段
+        self.decimal_fields = frozenset(decimal_fields)
+        # 需要转成 ISO 8601 字符串返回的时间字段
+        self.datetime_fields = frozenset(datetime_fields)
+
+    def validate(self, names):
+        """返回 names 中不支持的字段名列表。"""
+        return [name for name in names if name not in self.fields]
+
+    def columns(self, names=None):
+        names = self.fields if names is None else names
+        return [self.fields[name] for name in names]
+
+    def values(self, queryset, names=None, extra=()):
+        # extra 用于附带分页等内部需要、但不一定返回给客户端的列
+        columns = dict.fromkeys(self.columns(names))
+        columns.update(dict.fromkeys(extra))
+        return queryset.values(*columns)
+
+    def to_dict(self, row, names=None):
+        names = self.fields if names is None else names
+        item = {}
+        for name in names:
+            value = row[self.fields[name]]
+            if value is not None:
+                if name in self.decimal_fields:
+                    value = str(value)
+                elif name in self.datetime_fields:
+                    value = value.isoformat()
+            item[name] = value
+        return item
+
+    def serialize(self, queryset, names=None):
+        return [self.to_dict(row, names) for row in self.values(queryset, names)]
+
+    async def aserialize(self, queryset, names=None):
+        return [self.to_dict(row, names) async for row in self.values(queryset, names)]
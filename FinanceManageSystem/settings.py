@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,9 +43,15 @@ INSTALLED_APPS = [
 ]
 AUTH_USER_MODEL = 'userpro.User'
 
+# 认证后端会缓存已登录用户，用户保存或退出登录时失效（缓存别名与启用条件见下方 AUTH_CACHE_ALIAS）
+AUTHENTICATION_BACKENDS = ['userpro.backends.CachedModelBackend']
+AUTH_USER_CACHE_TIMEOUT = 300
+
 MIDDLEWARE = [
+    'FinanceManageSystem.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'FinanceManageSystem.middleware.RateLimitMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -52,6 +59,25 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# 请求指标采集（SQL 次数/耗时、视图耗时、响应大小），默认关闭，设置 FMS_REQUEST_METRICS=1 开启
+REQUEST_METRICS_ENABLED = os.environ.get('FMS_REQUEST_METRICS') == '1'
+
+# 写接口限流（令牌桶），设置 FMS_RATE_LIMIT=0 关闭
+# RATE_LIMITS: URL 名称 -> {维度: 限额}，维度为 user（按登录会话）或 ip（按客户端 IP），限额格式为 次数/周期(s/m/h/d)
+RATE_LIMIT_ENABLED = os.environ.get('FMS_RATE_LIMIT', '1') == '1'
+RATE_LIMITS = {
+    'add_trade': {'user': '120/m', 'ip': '600/m'},
+    'bulk_add_trades': {'user': '10/m', 'ip': '60/m'},
+    'delete_trade': {'user': '120/m', 'ip': '600/m'},
+    'user_profile': {'ip': '10/h'},  # 注册接口
+    'login': {'ip': '30/m'},
+}
+# 进程内存储；多进程部署可改为 'FinanceManageSystem.ratelimit.CacheBucketStore' 并配合共享缓存后端
+RATE_LIMIT_STORE = os.environ.get('FMS_RATE_LIMIT_STORE', 'FinanceManageSystem.ratelimit.LocalBucketStore')
+RATE_LIMIT_STORE_OPTIONS = {}
+# 位于反向代理之后时可改为 'HTTP_X_REAL_IP' 等由代理写入的请求头
+RATE_LIMIT_IP_HEADER = os.environ.get('FMS_RATE_LIMIT_IP_HEADER', 'REMOTE_ADDR')
+
 ROOT_URLCONF = 'FinanceManageSystem.urls'
 
 TEMPLATES = [
@@ -75,14 +101,103 @@ WSGI_APPLICATION = 'FinanceManageSystem.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# 通过 FMS_DB_ENGINE 选择数据库：sqlite（默认）或 postgres
+
+DB_ENGINE = os.environ.get('FMS_DB_ENGINE', 'sqlite')
 
-DATABASES = {
+if DB_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('FMS_DB_NAME', 'finance'),
+            'USER': os.environ.get('FMS_DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('FMS_DB_PASSWORD', ''),
+            'HOST': os.environ.get('FMS_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('FMS_DB_PORT', '5432'),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('FMS_DB_POOL') == '1':
+        # Django 5.1 原生连接池（需要安装 psycopg[pool]），与 CONN_MAX_AGE 持久连接互斥
+        DATABASES['default']['OPTIONS'] = {
+            'pool': {
+                'min_size': int(os.environ.get('FMS_DB_POOL_MIN_SIZE', 2)),
+                'max_size': int(os.environ.get('FMS_DB_POOL_MAX_SIZE', 10)),
+            },
+        }
+    else:
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.environ.get('FMS_DB_CONN_MAX_AGE', 60))
+elif DB_ENGINE == 'sqlite':
+    _SQLITE_NAME = os.environ.get('FMS_DB_NAME', BASE_DIR / 'db.sqlite3')
+    # WAL 允许读写并发，synchronous=NORMAL 在 WAL 下仍保证一致性。WAL 模式会持久写入数据库文件头，
+    # 仓库自带的 db.sqlite3 受版本控制，默认只对其他数据库文件启用，可用 FMS_SQLITE_WAL=1/0 强制开启或关闭
+    SQLITE_WAL_PRAGMAS = ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL']
+    SQLITE_WAL = os.environ.get(
+        'FMS_SQLITE_WAL', '0' if Path(_SQLITE_NAME).resolve() == BASE_DIR / 'db.sqlite3' else '1') == '1'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': _SQLITE_NAME,
+            'OPTIONS': {
+                # 每个新连接建立时执行：busy_timeout 让写锁冲突时等待而不是直接报 "database is locked"
+                'init_command': ';'.join([
+                    *(SQLITE_WAL_PRAGMAS if SQLITE_WAL else []),
+                    f"PRAGMA busy_timeout={int(os.environ.get('FMS_SQLITE_BUSY_TIMEOUT', 5000))}",
+                    f"PRAGMA mmap_size={int(os.environ.get('FMS_SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+                ]),
+                # 事务开始即获取写锁，避免读锁升级为写锁时的死锁报错
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+else:
+    raise ValueError(f'不支持的数据库类型 FMS_DB_ENGINE={DB_ENGINE!r}，可选 sqlite 或 postgres')
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# 默认使用进程内缓存，多进程部署时可通过环境变量切换到 Redis/Memcached 等共享后端
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get('FMS_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('FMS_CACHE_LOCATION', 'finance-manage-system'),
     }
 }
 
+# 已登录用户与会话使用的缓存别名。退出登录、禁用账号、修改密码时的缓存清除只发生在处理该请求的进程中，
+# 因此多进程部署必须把该别名指向 Redis/Memcached 等共享后端。别名指向进程内缓存（LocMem）时，
+# 认证后端不缓存用户、会话直接读写数据库；单进程运行（开发、测试）可设置 FMS_AUTH_CACHE_ALLOW_LOCAL=1 仍然启用
+AUTH_CACHE_ALIAS = 'default'
+AUTH_CACHE_ALLOW_LOCAL = os.environ.get('FMS_AUTH_CACHE_ALLOW_LOCAL') == '1'
+_AUTH_CACHE_SHARED = CACHES[AUTH_CACHE_ALIAS]['BACKEND'] != 'django.core.cache.backends.locmem.LocMemCache'
+
+# 缓存可用时会话优先从缓存读取，缓存未命中时再回落到数据库
+SESSION_CACHE_ALIAS = AUTH_CACHE_ALIAS
+if _AUTH_CACHE_SHARED or AUTH_CACHE_ALLOW_LOCAL:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# 接口读缓存使用的缓存别名与过期时间（秒）。写接口只在处理该请求的进程中递增用户版本号，
+# 因此多进程部署同样必须使用共享后端；别名指向进程内缓存时不缓存接口数据、不生成 ETag，
+# 单进程运行可设置 FMS_API_CACHE_ALLOW_LOCAL=1 仍然启用
+API_CACHE_ALIAS = 'default'
+API_CACHE_ALLOW_LOCAL = os.environ.get('FMS_API_CACHE_ALLOW_LOCAL') == '1'
+API_CACHE_TIMEOUT = 300
+
+# 每个账户累计多少条新流水后由 snapshot_balances 命令生成一次余额快照
+LEDGER_SNAPSHOT_INTERVAL = int(os.environ.get('FMS_LEDGER_SNAPSHOT_INTERVAL', 1000))
+# 快照只覆盖写入超过该秒数的流水，避开仍在事务中、尚未提交的流水；应大于最长的记账事务耗时
+LEDGER_SNAPSHOT_LAG = int(os.environ.get('FMS_LEDGER_SNAPSHOT_LAG', 60))
+
+# 删除账户/预算时每批 DELETE 的行数；账户的交易数超过 ACCOUNT_DELETE_INLINE_MAX_TRADES 时
+# 只标记删除，由 purge_deleted_accounts 命令在后台分批清理
+DELETE_CHUNK_SIZE = int(os.environ.get('FMS_DELETE_CHUNK_SIZE', 5000))
+ACCOUNT_DELETE_INLINE_MAX_TRADES = int(os.environ.get('FMS_ACCOUNT_DELETE_INLINE_MAX_TRADES', 20000))
+
+# add_trade 幂等键的保留时间（秒），过期记录由 purge_idempotency_keys 命令清理
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('FMS_IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -101,6 +216,34 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing
+# https://docs.djangoproject.com/en/5.1/topics/auth/passwords/
+# FMS_PASSWORD_HASHER 选择新密码使用的算法（scrypt/pbkdf2/argon2），成本参数可通过环境变量调整；
+# 用户登录成功时，算法或成本参数与当前策略不一致的已存哈希会自动重新哈希
+
+PASSWORD_HASHER = os.environ.get('FMS_PASSWORD_HASHER', 'scrypt')
+
+PASSWORD_HASHER_COST = {
+    'pbkdf2_iterations': int(os.environ.get('FMS_PBKDF2_ITERATIONS', 870000)),
+    'scrypt_work_factor': int(os.environ.get('FMS_SCRYPT_WORK_FACTOR', 2 ** 14)),
+    'scrypt_block_size': int(os.environ.get('FMS_SCRYPT_BLOCK_SIZE', 8)),
+    'scrypt_parallelism': int(os.environ.get('FMS_SCRYPT_PARALLELISM', 5)),
+    'argon2_time_cost': int(os.environ.get('FMS_ARGON2_TIME_COST', 2)),
+    'argon2_memory_cost': int(os.environ.get('FMS_ARGON2_MEMORY_COST', 102400)),
+    'argon2_parallelism': int(os.environ.get('FMS_ARGON2_PARALLELISM', 8)),
+}
+
+_PASSWORD_HASHERS = {
+    'scrypt': 'userpro.hashers.ScryptPasswordHasher',
+    'pbkdf2': 'userpro.hashers.PBKDF2PasswordHasher',
+    'argon2': 'userpro.hashers.Argon2PasswordHasher',
+}
+
+# 第一个为新密码使用的算法，其余仅用于校验已有哈希
+PASSWORD_HASHERS = [_PASSWORD_HASHERS[PASSWORD_HASHER]] + [
+    path for name, path in _PASSWORD_HASHERS.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
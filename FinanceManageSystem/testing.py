@@ -0,0 +1,12 @@
+"""
+测试公用的设置。
+"""
+from django.test import override_settings
+
+# 测试在单进程中运行，允许认证缓存与会话缓存使用进程内缓存（见 settings.AUTH_CACHE_ALIAS），
+# 用于断言缓存命中后的查询次数
+local_auth_cache = override_settings(AUTH_CACHE_ALLOW_LOCAL=True,
+                                     SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+
+# 同理允许接口读缓存使用进程内缓存（见 settings.API_CACHE_ALIAS），用于断言缓存命中与 ETag
+local_api_cache = override_settings(API_CACHE_ALLOW_LOCAL=True)
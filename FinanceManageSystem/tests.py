@@ -0,0 +1,135 @@
+import logging
+
+from asgiref.sync import SyncToAsync
+from django.contrib.auth import get_user_model
+from django.core.handlers.base import BaseHandler
+from django.test import TestCase, override_settings
+
+from . import metrics, ratelimit
+from .middleware import RateLimitMiddleware
+
+User = get_user_model()
+
+
+class RequestMetricsMiddlewareTests(TestCase):
+    def setUp(self):
+        metrics.reset()
+        self.user = User.objects.create_user(username='admin', password='pw', is_staff=True)
+        self.client.force_login(self.user)
+
+    def test_disabled_by_default(self):
+        response = self.client.get('/userpro/get_user_info/')
+        self.assertNotIn('Server-Timing', response.headers)
+        self.assertEqual(metrics.snapshot(), {})
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    def test_records_server_timing_and_histogram(self):
+        response = self.client.get('/userpro/get_user_info/')
+        self.assertRegex(response['Server-Timing'], r'^sql;dur=[\d.]+;desc="\d+ queries", view;dur=[\d.]+, total;dur=')
+
+        body = self.client.get('/request_metrics/').json()
+        entry = body['data']['get_user_info']
+        self.assertEqual(entry['count'], 1)
+        self.assertGreaterEqual(entry['avg_sql_count'], 1)
+        self.assertEqual(sum(entry['total_ms_histogram'].values()), 1)
+        self.assertEqual(entry['avg_response_bytes'], len(response.content))
+
+
+    @override_settings(REQUEST_METRICS_ENABLED=True, DEBUG=True)
+    def test_async_handler_chain_is_not_adapted(self):
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            logging.getLogger('django.request').debug('load_middleware')
+            BaseHandler().load_middleware(is_async=True)
+        self.assertEqual([line for line in logs.output if 'adapted' in line and 'RequestMetricsMiddleware' in line], [])
+
+    @override_settings(REQUEST_METRICS_ENABLED=True)
+    async def test_records_queries_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get('/userpro/get_user_info_async/')
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response['Server-Timing'], r'desc="[1-9]\d* queries", view;dur=[\d.]+, total;dur=')
+        entry = metrics.snapshot()['get_user_info_async']
+        self.assertGreaterEqual(entry['avg_sql_count'], 1)
+
+
+@override_settings(RATE_LIMITS={'add_trade': {'user': '2/m', 'ip': '3/m'}, 'user_profile': {'ip': '1/h'}})
+class RateLimitMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.force_login(self.user)
+
+    def test_rejects_over_limit_before_view_runs(self):
+        for _ in range(2):
+            self.assertNotEqual(self.client.post('/trade/add_trade/', '{}', content_type='application/json').status_code, 429)
+        # 超限请求不解析请求体，也不访问数据库
+        with self.assertNumQueries(0):
+            response = self.client.post('/trade/add_trade/', 'not json', content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response.json()['code'], 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_limits_are_per_user_and_per_ip(self):
+        self.client.post('/trade/add_trade/', '{}', content_type='application/json')
+        self.client.post('/trade/add_trade/', '{}', content_type='application/json')
+        # 同一 IP 下的另一个用户还有自己的用户额度，但共享 IP 额度
+        self.client.force_login(User.objects.create_user(username='bob', password='pw'))
+        self.assertNotEqual(self.client.post('/trade/add_trade/', '{}', content_type='application/json').status_code, 429)
+        self.assertEqual(self.client.post('/trade/add_trade/', '{}', content_type='application/json').status_code, 429)
+        # 未配置限额的接口不受影响
+        self.assertEqual(self.client.get('/userpro/get_user_info/').status_code, 200)
+
+    @override_settings(DEBUG=True)
+    def test_async_handler_chain_is_not_adapted(self):
+        # DEBUG 下中间件需要在同步/异步之间适配时，Django 会记录 "... handler adapted for middleware ..."
+        with self.assertLogs('django.request', 'DEBUG') as logs:
+            logging.getLogger('django.request').debug('load_middleware')
+            BaseHandler().load_middleware(is_async=True)
+        self.assertEqual([line for line in logs.output if 'adapted' in line and 'RateLimitMiddleware' in line], [])
+
+    def test_async_process_view_is_not_run_in_a_thread(self):
+        handler = BaseHandler()
+        handler.load_middleware(is_async=True)
+        [method] = [method for method in handler._view_middleware
+                    if isinstance(getattr(method, '__self__', None), RateLimitMiddleware)]
+        # 直接是中间件的协程方法，而不是 sync_to_async 包装
+        self.assertNotIsInstance(method, SyncToAsync)
+
+    async def test_limits_apply_under_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        statuses = [(await self.async_client.post('/trade/add_trade/', '{}', content_type='application/json')).status_code
+                    for _ in range(3)]
+        self.assertEqual(statuses[-1], 429)
+
+    def test_anonymous_requests_use_ip_limit(self):
+        self.client.logout()
+        body = '{"username": "x"}'
+        self.assertNotEqual(self.client.post('/userpro/register/', body, content_type='application/json').status_code, 429)
+        response = self.client.post('/userpro/register/', body, content_type='application/json', REMOTE_ADDR='10.0.0.1')
+        self.assertNotEqual(response.status_code, 429)
+        response = self.client.post('/userpro/register/', body, content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '3600')
+
+
+class TokenBucketTests(TestCase):
+    def test_refills_at_configured_rate(self):
+        capacity, refill_rate = ratelimit.parse_rate('2/s')
+        state, wait = ratelimit.take(None, capacity, refill_rate, 100.0)
+        state, wait = ratelimit.take(state, capacity, refill_rate, 100.0)
+        self.assertEqual(wait, 0)
+        state, wait = ratelimit.take(state, capacity, refill_rate, 100.0)
+        self.assertEqual(wait, 1)
+        # 0.5 秒补充 1 个令牌
+        state, wait = ratelimit.take(state, capacity, refill_rate, 100.5)
+        self.assertEqual(wait, 0)
+
+    def test_local_store_evicts_least_recently_used(self):
+        store = ratelimit.LocalBucketStore(max_keys=2)
+        for key in ('a', 'b', 'c'):
+            store.take(key, 1, 1)
+        self.assertEqual(list(store._buckets), ['b', 'c'])
+        self.assertEqual(store.take('a', 1, 0.001), 0)
+
+    def test_rejects_invalid_rate(self):
+        with self.assertRaises(ValueError):
+            ratelimit.parse_rate('10/week')
@@ -1,10 +1,14 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from . import views
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('userpro/', include('userpro.urls')),
     path('account/', include('account.urls')),
     path('budget/', include('budget.urls')),
     path('trade/', include('trade.urls')),
+    path('cache_stats/', views.cache_stats, name='cache_stats'),
+    path('request_metrics/', views.request_metrics, name='request_metrics'),
 ]
@@ -0,0 +1,39 @@
+from django.contrib.auth.decorators import login_required
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+
+from . import cache, metrics
+
+
+@login_required
+@csrf_exempt
+def cache_stats(request):
+    if not request.user.is_staff:
+        return JsonResponse({
+            "code": 403,
+            "message": "仅管理员可访问",
+            "data": {}
+        })
+
+    return JsonResponse({
+        "code": 200,
+        "message": "获取缓存统计成功",
+        "data": cache.get_stats()
+    })
+
+
+@login_required
+@csrf_exempt
+def request_metrics(request):
+    if not request.user.is_staff:
+        return JsonResponse({
+            "code": 403,
+            "message": "仅管理员可访问",
+            "data": {}
+        })
+
+    return JsonResponse({
+        "code": 200,
+        "message": "获取请求指标成功",
+        "data": metrics.snapshot()
+    })
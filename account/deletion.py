@@ -0,0 +1,90 @@
+"""
+账户与预算的分批级联删除。
+
+Model.delete() 会把整个级联（交易、流水、汇总）放进一个事务，一次性删除几十万行交易时
+长时间持有写锁。这里按主键范围分批删除子表：交易、流水、快照、汇总都没有下级关联和删除信号，
+对它们的 QuerySet.delete() 直接执行一条 DELETE，不加载模型实例，每批单独提交。
+
+删除前总是先标记 deleting，账户立即从各接口中隐藏且不再接受记账；交易数不超过
+ACCOUNT_DELETE_INLINE_MAX_TRADES 的账户随后在请求中直接分批删除，更大的账户由
+purge_deleted_accounts 命令在后台清理。中途失败的账户保持标记，由该命令重新清理。
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from budget.models import Budget
+from trade.models import Trade, TradeRollup
+from trade.services import EXPENSE_TYPES
+from .models import Account, BalanceSnapshot, LedgerEntry
+
+
+def delete_chunked(queryset, chunk_size=None, before_delete=None):
+    """
+    按主键顺序分批删除 queryset 中的行，返回删除的行数。
+
+    before_delete(batch) 在每批 DELETE 之前、同一事务中执行。
+    """
+    chunk_size = chunk_size or settings.DELETE_CHUNK_SIZE
+    deleted = 0
+    while True:
+        # 第 chunk_size 行的主键作为本批的上界，整批删除由一条带范围条件的 DELETE 完成
+        boundary = list(queryset.order_by('pk').values_list('pk', flat=True)[chunk_size - 1:chunk_size])
+        batch = queryset.filter(pk__lte=boundary[0]) if boundary else queryset
+        with transaction.atomic():
+            if before_delete:
+                before_delete(batch)
+            count, _ = batch.delete()
+        deleted += count
+        if not boundary:
+            return deleted
+
+
+def _release_budget_counters(trades, account_id):
+    # 记在其他账户预算上的交易：按预算汇总后回减已消费金额与交易笔数，本账户的预算随后整体删除
+    rows = (trades.exclude(budget__account_id=account_id).order_by().values('budget_id')
+            .annotate(count=Count('id'), spent=Sum('tradebalance', filter=Q(tradetype__in=EXPENSE_TYPES))))
+    for row in rows:
+        updates = {"trade_count": F('trade_count') - row['count']}
+        if row['spent'] is not None:
+            updates["spent"] = F('spent') - row['spent']
+        Budget.objects.filter(id=row['budget_id']).update(**updates)
+
+
+def purge_budget(budget_id, chunk_size=None):
+    """分批删除预算的交易与汇总，再删除预算本身。"""
+    delete_chunked(Trade.objects.filter(budget_id=budget_id), chunk_size)
+    delete_chunked(TradeRollup.objects.filter(budget_id=budget_id), chunk_size)
+    Budget.objects.filter(id=budget_id).delete()
+
+
+def purge_account(account_id, chunk_size=None):
+    """分批删除账户的交易、流水、快照、汇总与预算，再删除账户本身。"""
+    delete_chunked(Trade.objects.filter(account_id=account_id), chunk_size,
+                   lambda batch: _release_budget_counters(batch, account_id))
+    for table in (LedgerEntry, BalanceSnapshot, TradeRollup):
+        delete_chunked(table.objects.filter(account_id=account_id), chunk_size)
+    # 预算下可能还有记在其他账户上的交易，与 CASCADE 的行为一致一并删除
+    for budget_id in Budget.objects.filter(account_id=account_id).values_list('id', flat=True):
+        purge_budget(budget_id, chunk_size)
+    Account.objects.filter(id=account_id).delete()
+
+
+def delete_account(account):
+    """
+    标记并删除账户，返回 True 表示已删除；交易过多时只保留 deleting 标记并返回 False，由后台清理。
+    """
+    Account.objects.filter(id=account.id).update(deleting=True)
+    limit = settings.ACCOUNT_DELETE_INLINE_MAX_TRADES
+    if Trade.objects.filter(account_id=account.id)[:limit + 1].count() <= limit:
+        purge_account(account.id)
+        return True
+    return False
+
+
+def purge_deleted_accounts(chunk_size=None):
+    """清理所有已标记删除的账户，返回清理的账户数。"""
+    account_ids = list(Account.objects.filter(deleting=True).values_list('id', flat=True))
+    for account_id in account_ids:
+        purge_account(account_id, chunk_size)
+    return len(account_ids)
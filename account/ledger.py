@@ -0,0 +1,157 @@
+"""
+账户流水（LedgerEntry）与余额快照（BalanceSnapshot）。
+
+账户每次余额变动都追加一条流水，流水只增不改；余额快照记录截至某条流水的余额合计，
+任意时点的余额 = 该时点之前最近的快照 + 快照之后到该时点的流水。快照由 snapshot_balances
+命令按 LEDGER_SNAPSHOT_INTERVAL 定期生成，因此每次查询最多累加一个间隔内的流水。
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Count, DecimalField, F, Max, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, RowNumber, TruncDate
+from django.utils import timezone
+
+from FinanceManageSystem.money import money
+from .models import Account, BalanceSnapshot, LedgerEntry
+
+# bulk_create 每批插入的行数
+BULK_BATCH_SIZE = 500
+
+# 对账时每批从数据库读取的行数
+STREAM_CHUNK_SIZE = 5000
+
+
+def record(account_id, amount, entry_type, counterparty='', trade_id=None):
+    return LedgerEntry.objects.create(account_id=account_id, amount=amount, entry_type=entry_type,
+                                      counterparty=counterparty, trade_id=trade_id)
+
+
+def record_many(entries):
+    return LedgerEntry.objects.bulk_create(entries, batch_size=BULK_BATCH_SIZE)
+
+
+def balance_at(account_id, when=None):
+    """账户在 when 时刻（含）的余额，when 为空时为当前流水合计。"""
+    snapshots = BalanceSnapshot.objects.filter(account_id=account_id)
+    entries = LedgerEntry.objects.filter(account_id=account_id)
+    if when is not None:
+        snapshots = snapshots.filter(as_of__lte=when)
+        entries = entries.filter(created_at__lte=when)
+    snapshot = snapshots.order_by('-last_entry_id').values_list('last_entry_id', 'balance').first()
+    last_entry_id, balance = snapshot or (0, Decimal('0.00'))
+    total = entries.filter(id__gt=last_entry_id).aggregate(total=Sum('amount'))['total']
+    return money(balance + money(total))
+
+
+def daily_balances(account_id, start, end):
+    """
+    账户在 [start, end] 内每天（按 TIME_ZONE）的日终余额，返回 [(date, balance)]。
+
+    一条 SQL 完成：从 start 之前最近的快照起，用窗口函数对之后的流水做累计求和，
+    并用 ROW_NUMBER 只保留每天最后一条流水的累计值；没有流水的日期沿用前一天的余额。
+    扫描的流水条数不超过快照间隔加上范围内的流水数，与账户的历史流水总数无关。
+    """
+    since = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    until = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    snapshot = BalanceSnapshot.objects.filter(account_id=account_id, as_of__lt=since).order_by('-last_entry_id')
+    rows = LedgerEntry.objects.filter(
+        account_id=account_id,
+        created_at__lt=until,
+        id__gt=Coalesce(Subquery(snapshot.values('last_entry_id')[:1]), Value(0)),
+    ).annotate(
+        day=TruncDate('created_at'),
+        running=Window(Sum('amount'), order_by=[F('created_at').asc(), F('id').asc()]),
+        last_of_day=Window(RowNumber(), partition_by=[TruncDate('created_at')],
+                           order_by=[F('created_at').desc(), F('id').desc()]),
+        opening=Coalesce(Subquery(snapshot.values('balance')[:1]), Value(Decimal('0.00')),
+                         output_field=DecimalField(max_digits=15, decimal_places=2)),
+    ).filter(last_of_day=1).order_by('day').values_list('day', 'running', 'opening')
+
+    rows = list(rows)
+    if rows:
+        balance = money(rows[0][2])
+    else:
+        # 快照之后到 end 都没有流水，余额就是快照余额
+        balance = money(snapshot.values_list('balance', flat=True).first())
+    closing = {}
+    for day, running, opening in rows:
+        if day < start:
+            balance = money(opening + money(running))
+        else:
+            closing[day] = money(opening + money(running))
+
+    series = []
+    day = start
+    while day <= end:
+        balance = closing.get(day, balance)
+        series.append((day, balance))
+        day += datetime.timedelta(days=1)
+    return series
+
+
+def take_snapshots(interval=None, lag=None):
+    """
+    为自上次快照以来新增流水数不少于 interval 的账户生成快照，返回生成的快照数。
+
+    一条查询按账户统计最近快照之后的流水（每个账户只在索引上扫描快照之后的部分），再批量插入快照。
+    只统计 lag 秒之前写入的流水：未提交事务中的流水 ID 可能小于已提交流水的最大 ID，
+    若快照越过它，balance_at/daily_balances 只累加 ID 更大的流水，这条流水就永远计不进去。
+    """
+    interval = interval or settings.LEDGER_SNAPSHOT_INTERVAL
+    lag = settings.LEDGER_SNAPSHOT_LAG if lag is None else lag
+    cutoff = timezone.now() - datetime.timedelta(seconds=lag)
+    latest = BalanceSnapshot.objects.filter(account=OuterRef('pk')).order_by('-last_entry_id')
+    since_latest = LedgerEntry.objects.filter(
+        account=OuterRef('pk'),
+        created_at__lt=cutoff,
+        id__gt=Coalesce(Subquery(
+            BalanceSnapshot.objects.filter(account=OuterRef(OuterRef('pk')))
+            .order_by('-last_entry_id').values('last_entry_id')[:1]
+        ), Value(0)),
+    ).order_by().values('account')
+
+    def since_latest_aggregate(expression):
+        return Subquery(since_latest.annotate(value=expression).values('value'))
+
+    rows = list(Account.objects.filter(deleting=False).annotate(pending=since_latest_aggregate(Count('id'))).filter(
+        pending__gte=interval
+    ).annotate(
+        total=since_latest_aggregate(Sum('amount')),
+        last_entry_id=since_latest_aggregate(Max('id')),
+        as_of=since_latest_aggregate(Max('created_at')),
+        previous=Subquery(latest.values('balance')[:1]),
+    ).values('id', 'total', 'last_entry_id', 'as_of', 'previous'))
+
+    BalanceSnapshot.objects.bulk_create([
+        BalanceSnapshot(account_id=row['id'], last_entry_id=row['last_entry_id'], as_of=row['as_of'],
+                        balance=money(money(row['previous']) + money(row['total'])))
+        for row in rows
+    ], batch_size=BULK_BATCH_SIZE)
+    return len(rows)
+
+
+def reconcile():
+    """
+    逐个账户比较 accountbalance 与流水合计，生成 (account_id, accountbalance, ledger_total) 不一致项。
+
+    两条按账户 ID 排序的流式查询（账户表、按账户 GROUP BY 的流水合计）做归并，
+    每张表只扫描一遍，内存占用与账户数无关。
+    """
+    totals = LedgerEntry.objects.values_list('account_id').annotate(total=Sum('amount')).order_by('account_id')
+    totals = totals.iterator(chunk_size=STREAM_CHUNK_SIZE)
+    # 标记删除的账户正在分批清理流水，不参与对账
+    accounts = Account.objects.filter(deleting=False).order_by('id').values_list('id', 'accountbalance').iterator(
+        chunk_size=STREAM_CHUNK_SIZE)
+
+    current = next(totals, None)
+    for account_id, balance in accounts:
+        # 跳过已删除或正在删除的账户的流水
+        while current is not None and current[0] < account_id:
+            current = next(totals, None)
+        ledger_total = Decimal('0.00')
+        if current is not None and current[0] == account_id:
+            ledger_total = money(current[1])
+        if money(balance) != ledger_total:
+            yield account_id, balance, ledger_total
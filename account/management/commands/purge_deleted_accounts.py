@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account.deletion import purge_deleted_accounts
+
+
+class Command(BaseCommand):
+    help = '分批清理已标记删除的账户及其交易、流水与预算，建议定期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.DELETE_CHUNK_SIZE,
+                            help='每批删除的行数')
+
+    def handle(self, *args, **options):
+        purged = purge_deleted_accounts(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'已清理 {purged} 个标记删除的账户'))
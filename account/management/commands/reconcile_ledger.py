@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from account.ledger import reconcile
+
+
+class Command(BaseCommand):
+    help = '流式核对所有账户的余额与流水合计，报告不一致的账户'
+
+    def handle(self, *args, **options):
+        count = 0
+        for account_id, balance, ledger_total in reconcile():
+            count += 1
+            self.stdout.write(f'账户 {account_id}: 余额 {balance}，流水合计 {ledger_total}')
+        if count:
+            raise CommandError(f'{count} 个账户的余额与流水不一致')
+        self.stdout.write(self.style.SUCCESS('所有账户余额与流水一致'))
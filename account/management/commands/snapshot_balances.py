@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from account.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = '为新增流水达到间隔的账户生成余额快照，建议定期执行'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=int, default=settings.LEDGER_SNAPSHOT_INTERVAL,
+                            help='自上次快照以来至少新增多少条流水才生成快照')
+        parser.add_argument('--lag', type=int, default=settings.LEDGER_SNAPSHOT_LAG,
+                            help='只覆盖写入超过该秒数的流水')
+
+    def handle(self, *args, **options):
+        created = take_snapshots(options['interval'], options['lag'])
+        self.stdout.write(self.style.SUCCESS(f'已生成 {created} 个账户的余额快照'))
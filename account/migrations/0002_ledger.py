@@ -0,0 +1,55 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:18
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_opening_entries(apps, schema_editor):
+    # 已有账户的当前余额记为期初流水，之后的变动均由记账逻辑追加
+    Account = apps.get_model('account', 'Account')
+    LedgerEntry = apps.get_model('account', 'LedgerEntry')
+    LedgerEntry.objects.bulk_create([
+        LedgerEntry(account_id=account_id, amount=balance, entry_type='opening')
+        for account_id, balance in Account.objects.exclude(accountbalance=0).values_list('id', 'accountbalance')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_entry_id', models.BigIntegerField()),
+                ('as_of', models.DateTimeField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='account.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'as_of'], name='snapshot_account_as_of_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'last_entry_id'), name='snapshot_account_entry_uniq')],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('entry_type', models.CharField(choices=[('opening', '期初余额'), ('trade', '记账'), ('reversal', '删除交易退回')], max_length=20)),
+                ('counterparty', models.CharField(blank=True, default='', max_length=50)),
+                ('trade_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='account.account')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_opening_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0002_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='account',
+            name='deleting',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Account(models.Model):
@@ -21,5 +22,64 @@ class Account(models.Model):
     # 账户余额
     accountbalance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
 
+    # 已标记删除、等待 purge_deleted_accounts 命令在后台分批清理的账户，各接口不再返回
+    deleting = models.BooleanField(default=False)
+
     def __str__(self):
         return f'{self.accountname} ({self.accounttype})'
+
+
+class LedgerEntry(models.Model):
+    # 只追加的账户流水：每次余额变动记一条，账户余额应始终等于其全部流水金额之和
+    ENTRY_TYPE_CHOICES = [
+        ('opening', '期初余额'),
+        ('trade', '记账'),
+        ('reversal', '删除交易退回'),
+    ]
+
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='ledger_entries')
+
+    # 余额变动金额，增加为正、减少为负
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPE_CHOICES)
+
+    # 对方科目：交易类型（如 Dining、Deposit），期初余额为空
+    counterparty = models.CharField(max_length=50, blank=True, default='')
+
+    # 关联的交易 ID；交易删除后流水保持不变，因此不使用外键
+    trade_id = models.BigIntegerField(null=True, blank=True)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='ledger_account_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.account_id} {self.entry_type} {self.amount}'
+
+
+class BalanceSnapshot(models.Model):
+    # 账户余额快照：截至 last_entry_id（含）的流水合计，查询任意时点余额时
+    # 只需从最近的快照起累加之后的流水，由 snapshot_balances 命令定期生成
+    account = models.ForeignKey(Account, on_delete=models.CASCADE, related_name='balance_snapshots')
+
+    last_entry_id = models.BigIntegerField()
+
+    # last_entry_id 对应流水的时间
+    as_of = models.DateTimeField()
+
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'last_entry_id'], name='snapshot_account_entry_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['account', 'as_of'], name='snapshot_account_as_of_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.account_id} @ {self.last_entry_id}: {self.balance}'
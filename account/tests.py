@@ -1,3 +1,367 @@
-from django.test import TestCase
+import json
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from FinanceManageSystem.cache import get_stats
+from FinanceManageSystem.testing import local_api_cache, local_auth_cache
+from budget.models import Budget
+from trade.models import Trade, TradeRollup
+from trade.services import bulk_create_trades, create_trade, remove_trade
+from . import ledger
+from .models import Account, BalanceSnapshot, LedgerEntry
+
+User = get_user_model()
+
+
+@local_api_cache
+class AccountReadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.force_login(self.user)
+
+    def _post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json').json()
+
+    def test_listing_is_cached_until_a_write(self):
+        self._post('/account/add_account/', {'accountname': '工资卡', 'accounttype': 'bank'})
+        first = self.client.get('/account/get_user_accounts/').json()
+        before = get_stats()
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/account/get_user_accounts/').json()
+        self.assertEqual(first, second)
+        self.assertEqual(get_stats()['hits'], before['hits'] + 1)
+        # 命中缓存时只剩会话与用户查询
+        self.assertFalse(any('account_account' in query['sql'] for query in ctx.captured_queries))
+
+        account_id = first['data'][0]['accountid']
+        self._post('/account/update_account/', {'account_id': account_id, 'accountname': '储蓄卡'})
+        body = self.client.get('/account/get_user_accounts/').json()
+        self.assertEqual(body['data'][0]['accountname'], '储蓄卡')
+        detail = self._post('/account/get_account_details/', {'account_id': account_id})
+        self.assertEqual(detail['data']['accountname'], '储蓄卡')
+
+    def test_cache_stats_requires_staff(self):
+        self.assertEqual(self.client.get('/cache_stats/').json()['code'], 403)
+        self.user.is_staff = True
+        self.user.save()
+        body = self.client.get('/cache_stats/').json()
+        self.assertEqual(set(body['data']), {'hits', 'misses'})
+
+    def test_cache_is_per_user(self):
+        Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        self.client.get('/account/get_user_accounts/')
+        other = User.objects.create_user(username='bob', password='pw')
+        self.client.force_login(other)
+        self.assertEqual(self.client.get('/account/get_user_accounts/').json()['code'], 404)
+
+
+@local_api_cache
+class AsyncReadViewsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='carol', password='pw', nickname='小C')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+
+    async def test_async_views_match_sync_views(self):
+        await self.async_client.aforce_login(self.user)
+        for sync_url, async_url, method, data in [
+            ('/account/get_user_accounts/', '/account/get_user_accounts_async/', 'get', None),
+            ('/budget/get_user_budgets/', '/budget/get_user_budgets_async/', 'get', None),
+            ('/trade/get_trades/', '/trade/get_trades_async/', 'get', None),
+            ('/userpro/get_user_info/', '/userpro/get_user_info_async/', 'get', None),
+            ('/account/get_account_details/', '/account/get_account_details_async/', 'post',
+             json.dumps({'account_id': self.account.id})),
+        ]:
+            if method == 'get':
+                expected = (await self.async_client.get(sync_url)).json()
+                response = await self.async_client.get(async_url)
+            else:
+                expected = (await self.async_client.post(sync_url, data, content_type='application/json')).json()
+                response = await self.async_client.post(async_url, data, content_type='application/json')
+            self.assertEqual(response.json(), expected, async_url)
+
+    async def test_async_listing_supports_etag_and_login(self):
+        response = await self.async_client.get('/account/get_user_accounts_async/')
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        etag = (await self.async_client.get('/account/get_user_accounts_async/'))['ETag']
+        response = await self.async_client.get('/account/get_user_accounts_async/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+
+
+class ProcessLocalApiCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='erin', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        self.client.force_login(self.user)
+
+    def test_listing_is_not_cached_in_process_local_cache_by_default(self):
+        # 其他进程的写请求无法递增本进程的版本号，默认不缓存接口数据，也不返回 ETag
+        response = self.client.get('/account/get_user_accounts/')
+        self.assertNotIn('ETag', response.headers)
+        Account.objects.filter(id=self.account.id).update(accountname='储蓄卡')
+        body = self.client.get('/account/get_user_accounts/').json()
+        self.assertEqual(body['data'][0]['accountname'], '储蓄卡')
+
+
+@local_auth_cache
+class AccountDetailsBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='pia', password='pw')
+        self.accounts = Account.objects.bulk_create([
+            Account(user=self.user, accountname=f'账户{i}', accounttype='bank') for i in range(30)
+        ])
+        other = User.objects.create_user(username='quinn', password='pw')
+        self.other_account = Account.objects.create(user=other, accountname='别人的卡', accounttype='bank')
+        self.client.force_login(self.user)
+
+    def test_all_details_in_one_query_with_bulk_ownership_check(self):
+        ids = [account.id for account in self.accounts] + [self.other_account.id]
+        self.client.get('/userpro/get_user_info/')
+        with self.assertNumQueries(1):
+            body = self.client.post('/account/get_account_details_batch/', json.dumps({'account_ids': ids}),
+                                    content_type='application/json').json()
+        self.assertEqual([item['accountid'] for item in body['data']['accounts']], ids[:30])
+        self.assertEqual(body['data']['missing'], [self.other_account.id])
+        body = self.client.post('/account/get_account_details_batch/', json.dumps({'account_ids': 1}),
+                                content_type='application/json').json()
+        self.assertEqual(body['code'], 400)
+
+
+@local_auth_cache
+class AccountAggregateListingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='rita', password='pw')
+        self.wallet = Account.objects.create(user=self.user, accountname='钱包', accounttype='cash')
+        self.card = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        food = Budget.objects.create(account=self.card, budgetname='吃饭', budgettype='Dining')
+        Budget.objects.create(account=self.card, budgetname='出行', budgettype='Transportation')
+        create_trade(self.card, food, Decimal('100.00'), 'Deposit')
+        create_trade(self.card, food, Decimal('12.50'), 'Dining')
+        create_trade(self.card, food, Decimal('7.25'), 'Dining')
+        self.client.force_login(self.user)
+
+    def test_aggregates_in_one_query(self):
+        self.client.get('/userpro/get_user_info/')
+        with self.assertNumQueries(1):
+            body = self.client.get('/account/get_user_accounts/?include=budget_count,trade_count,total_spent').json()
+        self.assertEqual(body['data'], [
+            {'accountid': self.wallet.id, 'accountname': '钱包', 'accounttype': 'cash', 'accountbalance': '0.00',
+             'trade_count': 0, 'total_spent': '0.00', 'budget_count': 0},
+            {'accountid': self.card.id, 'accountname': '工资卡', 'accounttype': 'bank', 'accountbalance': '80.25',
+             'trade_count': 3, 'total_spent': '19.75', 'budget_count': 2},
+        ])
+        # 未指定 include 时返回原有字段
+        self.assertNotIn('trade_count', self.client.get('/account/get_user_accounts/').json()['data'][0])
+
+    def test_invalid_include(self):
+        body = self.client.get('/account/get_user_accounts/?include=trade_count,balance').json()
+        self.assertEqual(body['code'], 400)
+        self.assertIn('balance', body['message'])
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='lena', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+
+    def test_every_balance_change_is_appended_and_reconciles(self):
+        create_trade(self.account, self.budget, Decimal('100.00'), 'Deposit')
+        dinner = create_trade(self.account, self.budget, Decimal('30.00'), 'Dining')
+        bulk_create_trades(self.user, [
+            {'account_id': self.account.id, 'budget_id': self.budget.id, 'tradebalance': '5.50', 'tradetype': 'Dining'},
+        ])
+        remove_trade(dinner, restore_balance=True)
+
+        entries = LedgerEntry.objects.filter(account=self.account).order_by('id')
+        self.assertEqual([(entry.entry_type, entry.amount) for entry in entries], [
+            ('trade', Decimal('100.00')), ('trade', Decimal('-30.00')), ('trade', Decimal('-5.50')),
+            ('reversal', Decimal('30.00')),
+        ])
+        self.assertEqual(ledger.balance_at(self.account.id), Decimal('94.50'))
+        call_command('reconcile_ledger', stdout=StringIO())
+
+        # 绕过记账逻辑直接修改余额，对账时被发现
+        Account.objects.filter(id=self.account.id).update(accountbalance=Decimal('1.00'))
+        with self.assertRaisesMessage(CommandError, '1 个账户'):
+            call_command('reconcile_ledger', stdout=StringIO())
+
+    def test_concurrent_balance_change_survives_account_edit(self):
+        create_trade(self.account, self.budget, Decimal('100.00'), 'Deposit')
+        get = Account.objects.get
+
+        def get_then_trade(*args, **kwargs):
+            # 在读取账户之后、保存之前，另一个请求记了一笔账
+            account = get(*args, **kwargs)
+            create_trade(account, self.budget, Decimal('5.00'), 'Deposit')
+            return account
+
+        self.client.force_login(self.user)
+        with mock.patch.object(Account.objects, 'get', side_effect=get_then_trade):
+            body = self.client.post('/account/update_account/', json.dumps({
+                'account_id': self.account.id, 'accountname': '储蓄卡'}), content_type='application/json').json()
+        self.assertEqual(body['code'], 200)
+        self.account.refresh_from_db()
+        self.assertEqual((self.account.accountname, self.account.accountbalance), ('储蓄卡', Decimal('105.00')))
+        call_command('reconcile_ledger', stdout=StringIO())
+
+    def test_balance_at_uses_latest_snapshot(self):
+        for amount in ('10.00', '20.00', '30.00'):
+            create_trade(self.account, self.budget, Decimal(amount), 'Deposit')
+        # 刚写入的流水可能与未提交的事务交错，在 LEDGER_SNAPSHOT_LAG 内不生成快照
+        self.assertEqual(ledger.take_snapshots(2), 0)
+        call_command('snapshot_balances', interval=2, lag=0, stdout=StringIO())
+        snapshot = BalanceSnapshot.objects.get(account=self.account)
+        self.assertEqual(snapshot.balance, Decimal('60.00'))
+        # 新增流水不足一个间隔时不生成新快照
+        create_trade(self.account, self.budget, Decimal('5.00'), 'Dining')
+        self.assertEqual(ledger.take_snapshots(2, lag=0), 0)
+
+        # 早于快照的时点从流水累加
+        first = LedgerEntry.objects.filter(account=self.account).order_by('id').first()
+        self.assertEqual(ledger.balance_at(self.account.id, first.created_at), Decimal('10.00'))
+
+        # 快照之前的流水被修改也不影响当前余额，说明只从快照起累加
+        LedgerEntry.objects.filter(id__lte=snapshot.last_entry_id).update(amount=0)
+        with self.assertNumQueries(2):
+            self.assertEqual(ledger.balance_at(self.account.id), Decimal('55.00'))
+
+
+class BalanceHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='mia', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('55.00'))
+        self.client.force_login(self.user)
+
+        def entry(amount, day, hour=10):
+            LedgerEntry.objects.create(account=self.account, amount=Decimal(amount), entry_type='trade',
+                                       created_at=datetime(2024, 1, day, hour, tzinfo=dt_timezone.utc))
+
+        entry('100.00', 1)
+        entry('-20.00', 1, 12)
+        ledger.take_snapshots(2)
+        entry('-30.00', 3)
+        entry('5.00', 10)
+
+    def _post(self, url, data):
+        return self.client.post(url, json.dumps(dict(data, account_id=self.account.id)),
+                                content_type='application/json').json()
+
+    def test_daily_series_from_snapshot_in_one_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            body = self._post('/account/get_balance_series/', {'since': '2024-01-02', 'until': '2024-01-11'})
+        self.assertEqual([query['sql'].count('account_ledgerentry') > 0 for query in ctx].count(True), 1)
+        balances = [item['accountbalance'] for item in body['data']['series']]
+        self.assertEqual(balances, ['80.00'] + ['50.00'] * 7 + ['55.00'] * 2)
+
+        body = self._post('/account/get_balance_series/', {'since': '2023-12-31', 'until': '2024-01-01'})
+        self.assertEqual([item['accountbalance'] for item in body['data']['series']], ['0.00', '80.00'])
+        self.assertEqual(self._post('/account/get_balance_series/', {'since': '2024-02-01',
+                                                                     'until': '2024-01-01'})['code'], 400)
+
+    def test_balance_at_date(self):
+        self.assertEqual(self._post('/account/get_balance_at/', {'date': '2024-01-03'})['data']['accountbalance'],
+                         '50.00')
+        self.assertEqual(self._post('/account/get_balance_at/', {})['data']['accountbalance'], '55.00')
+        self.assertEqual(self._post('/account/get_balance_at/', {'date': 'yesterday'})['code'], 400)
+        self.client.force_login(User.objects.create_user(username='other', password='pw'))
+        self.assertEqual(self._post('/account/get_balance_at/', {'date': '2024-01-03'})['code'], 404)
+
+
+@override_settings(DELETE_CHUNK_SIZE=2, ACCOUNT_DELETE_INLINE_MAX_TRADES=2)
+class AccountDeletionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='nora', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+        self.other = Account.objects.create(user=self.user, accountname='钱包', accounttype='wallet')
+        create_trade(self.account, self.budget, Decimal('100.00'), 'Deposit')
+        create_trade(self.account, self.budget, Decimal('1.00'), 'Dining')
+        # 记在其他账户上、但使用本账户预算的交易
+        create_trade(self.other, self.budget, Decimal('2.00'), 'Deposit')
+        self.client.force_login(self.user)
+
+    def _delete(self):
+        return self.client.post('/account/delete_account/', json.dumps({'account_id': self.account.id}),
+                                content_type='application/json').json()
+
+    def _assert_purged(self):
+        self.assertFalse(Account.objects.filter(id=self.account.id).exists())
+        self.assertFalse(Budget.objects.filter(id=self.budget.id).exists())
+        self.assertFalse(Trade.objects.exists())
+        self.assertFalse(TradeRollup.objects.exists())
+        self.assertFalse(LedgerEntry.objects.filter(account_id=self.account.id).exists())
+
+    def test_small_account_is_deleted_in_chunks(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._delete()['code'], 200)
+        self._assert_purged()
+        # 只按主键取 ID，不加载交易实例
+        self.assertFalse([query for query in ctx if query['sql'].startswith('SELECT "trade_trade"."id", ')])
+
+    @override_settings(ACCOUNT_DELETE_INLINE_MAX_TRADES=10)
+    def test_releases_counters_of_other_accounts_budgets(self):
+        other_budget = Budget.objects.create(account=self.other, budgetname='零花', budgettype='Dining')
+        create_trade(self.other, other_budget, Decimal('1.50'), 'Dining')
+        # 记在本账户上、但使用其他账户预算的交易
+        create_trade(self.account, other_budget, Decimal('10.00'), 'Dining')
+        self.assertEqual(self._delete()['code'], 200)
+        other_budget.refresh_from_db()
+        self.assertEqual((other_budget.spent, other_budget.trade_count), (Decimal('1.50'), 1))
+        out = StringIO()
+        call_command('rebuild_budget_counters', '--verify', stdout=out)
+        self.assertIn('所有预算计数一致', out.getvalue())
+
+    def test_interrupted_inline_delete_leaves_account_hidden(self):
+        with mock.patch('account.deletion.LedgerEntry.objects.filter', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self._delete()
+        # 交易已删除但流水尚未删除：账户保持标记，不再出现在接口中，由后台命令清理
+        self.assertTrue(Account.objects.get(id=self.account.id).deleting)
+        call_command('purge_deleted_accounts', stdout=StringIO())
+        self._assert_purged()
+
+    def test_edit_does_not_clear_concurrent_deleting_flag(self):
+        get = Account.objects.get
+
+        def get_then_flag(*args, **kwargs):
+            # 在读取账户之后、保存之前，另一个请求把账户标记为删除
+            account = get(*args, **kwargs)
+            Account.objects.filter(id=account.id).update(deleting=True)
+            return account
+
+        with mock.patch.object(Account.objects, 'get', side_effect=get_then_flag):
+            self.client.post('/account/update_account/', json.dumps({
+                'account_id': self.account.id, 'accountname': '储蓄卡'}), content_type='application/json')
+        self.assertTrue(Account.objects.get(id=self.account.id).deleting)
+
+    def test_large_account_is_hidden_then_purged_in_background(self):
+        create_trade(self.account, self.budget, Decimal('1.00'), 'Dining')
+        body = self._delete()
+        self.assertEqual((body['code'], body['data']), (202, {'account_id': self.account.id}))
+        self.assertTrue(Account.objects.get(id=self.account.id).deleting)
+        accounts = self.client.get('/account/get_user_accounts/').json()['data']
+        self.assertEqual([item['accountid'] for item in accounts], [self.other.id])
+        self.assertEqual(len(self.client.get('/trade/get_trades/').json()['data']), 1)
+        self.assertEqual(self._delete()['code'], 404)
+        call_command('reconcile_ledger', stdout=StringIO())
+
+        out = StringIO()
+        call_command('purge_deleted_accounts', stdout=out)
+        self.assertIn('已清理 1 个', out.getvalue())
+        self._assert_purged()
@@ -5,6 +5,11 @@ urlpatterns = [
     path('add_account/', views.add_account, name='add_account'),
     path('delete_account/', views.delete_account, name='delete_account'),
     path('get_user_accounts/', views.get_user_accounts, name='get_user_accounts'),
+    path('get_user_accounts_async/', views.get_user_accounts_async, name='get_user_accounts_async'),
     path('update_account/', views.update_account, name='update_account'),
     path('get_account_details/', views.get_account_details, name='get_account_details'),
+    path('get_account_details_async/', views.get_account_details_async, name='get_account_details_async'),
+    path('get_account_details_batch/', views.get_account_details_batch, name='get_account_details_batch'),
+    path('get_balance_at/', views.get_balance_at, name='get_balance_at'),
+    path('get_balance_series/', views.get_balance_series, name='get_balance_series'),
 ]
@@ -1,10 +1,57 @@
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 from .models import Account
+from . import deletion, ledger
+from trade.models import TradeRollup
+from trade.services import EXPENSE_TYPES
+from FinanceManageSystem import cache
+from FinanceManageSystem.batch import DETAILS_BATCH_LIMIT, ids_key, parse_ids
+from FinanceManageSystem.money import money
+from FinanceManageSystem.serializers import RowSerializer
+import datetime
 import json
 
+# get_balance_series 单次最多返回的天数
+BALANCE_SERIES_MAX_DAYS = 5 * 366
+
+# 账户列表序列化
+ACCOUNT_SERIALIZER = RowSerializer({
+    "accountid": "id",
+    "accountname": "accountname",
+    "accounttype": "accounttype",
+    "accountbalance": "accountbalance",
+}, decimal_fields=["accountbalance"])
+
+
+def _rollup_total(column, output_field):
+    # 按账户汇总月度预聚合表，扫描行数取决于月份、预算与类型的组合数，与交易笔数无关
+    rollups = TradeRollup.objects.filter(account=OuterRef('pk'), period='month').order_by().values('account')
+    if column == 'total':
+        rollups = rollups.filter(tradetype__in=EXPENSE_TYPES)
+    return Coalesce(Subquery(rollups.annotate(value=Sum(column)).values('value')), Value(0),
+                    output_field=output_field)
+
+
+# get_user_accounts 可通过 include= 附带的聚合字段 -> 生成注解表达式的函数
+ACCOUNT_AGGREGATES = {
+    "trade_count": lambda: _rollup_total('trade_count', IntegerField()),
+    "total_spent": lambda: _rollup_total('total', DecimalField(max_digits=15, decimal_places=2)),
+    "budget_count": lambda: Count('budgets'),
+}
+
+# 附带聚合字段的账户列表序列化
+ACCOUNT_AGGREGATE_SERIALIZER = RowSerializer({
+    **ACCOUNT_SERIALIZER.fields,
+    **{name: name for name in ACCOUNT_AGGREGATES},
+}, decimal_fields=["accountbalance", "total_spent"])
+
 
 @login_required
 @csrf_exempt
@@ -31,6 +78,7 @@ def add_account(request):
                 accounttype=accounttype,
                 accountbalance=0.00  # 设置默认余额为 0
             )
+            cache.bump_version(request.user.id)
 
             # 返回创建成功的账户信息
             return JsonResponse({
@@ -64,10 +112,18 @@ def delete_account(request):
         try:
             account_id = json.loads(request.body).get('account_id')
             # 查找账户
-            account = Account.objects.get(id=account_id, user=request.user)
+            account = Account.objects.get(id=account_id, user=request.user, deleting=False)
 
-            # 删除账户
-            account.delete()
+            # 分批删除账户及其交易、流水、预算；交易过多时只标记删除，由后台命令清理
+            deleted = deletion.delete_account(account)
+            cache.bump_version(request.user.id)
+
+            if not deleted:
+                return JsonResponse({
+                    "code": 202,
+                    "message": "账户已标记删除，将在后台清理",
+                    "data": {"account_id": account.id}
+                })
 
             return JsonResponse({
                 "code": 200,
@@ -91,34 +147,79 @@ def delete_account(request):
 
 @login_required
 @csrf_exempt
+@condition(etag_func=cache.user_etag('get_user_accounts'))
 def get_user_accounts(request):
-    # 获取当前登录用户的所有账户
-    accounts = Account.objects.filter(user=request.user)
+    # 获取当前登录用户的所有账户，include= 指定的聚合字段与账户信息在同一条查询中取回
+    include, invalid = _parse_include(request)
+    if invalid:
+        return _invalid_include(invalid)
+    accounts, names = _user_accounts(request.user, include)
+    return JsonResponse(cache.get_or_build(
+        request.user.id, 'get_user_accounts',
+        lambda: _user_accounts_payload(_money_totals(ACCOUNT_AGGREGATE_SERIALIZER.serialize(accounts, names))), *include))
+
 
+@login_required
+@csrf_exempt
+@cache.async_user_etag('get_user_accounts')
+async def get_user_accounts_async(request):
+    # get_user_accounts 的原生异步版本，供 ASGI 部署使用
+    include, invalid = _parse_include(request)
+    if invalid:
+        return _invalid_include(invalid)
+    user = await request.auser()
+
+    async def build():
+        accounts, names = _user_accounts(user, include)
+        return _user_accounts_payload(_money_totals(await ACCOUNT_AGGREGATE_SERIALIZER.aserialize(accounts, names)))
+
+    return JsonResponse(await cache.aget_or_build(user.id, 'get_user_accounts', build, *include))
+
+
+def _parse_include(request):
+    # include=trade_count,total_spent,budget_count；返回按 ACCOUNT_AGGREGATES 顺序排列的字段与不支持的字段
+    names = [name.strip() for name in request.GET.get('include', '').split(',') if name.strip()]
+    invalid = [name for name in names if name not in ACCOUNT_AGGREGATES]
+    return [name for name in ACCOUNT_AGGREGATES if name in names], invalid
+
+
+def _invalid_include(invalid):
+    return JsonResponse({
+        "code": 400,
+        "message": f"无效的聚合字段: {', '.join(invalid)}",
+        "data": {}
+    })
+
+
+def _user_accounts(user, include):
+    # 预算数通过 JOIN 预算表计数，交易相关字段走相关子查询，避免两个一对多 JOIN 相乘导致重复计数
+    accounts = Account.objects.filter(user=user, deleting=False).annotate(
+        **{name: ACCOUNT_AGGREGATES[name]() for name in include}
+    ).order_by('id')
+    return accounts, [*ACCOUNT_SERIALIZER.fields, *include]
+
+
+def _money_totals(account_data):
+    for item in account_data:
+        if "total_spent" in item:
+            item["total_spent"] = str(money(item["total_spent"]))
+    return account_data
+
+
+def _user_accounts_payload(account_data):
     # 如果没有账户，返回提示信息
-    if not accounts.exists():
-        return JsonResponse({
+    if not account_data:
+        return {
             "code": 404,
             "message": "当前用户没有账户",
             "data": {}
-        })
-
-    # 构建账户信息列表
-    account_data = [
-        {
-            "accountid": account.id,
-            "accountname": account.accountname,
-            "accounttype": account.accounttype,
-            "accountbalance": str(account.accountbalance)
         }
-        for account in accounts
-    ]
 
-    return JsonResponse({
+    return {
         "code": 200,
         "message": "获取用户账户信息成功",
         "data": account_data
-    })
+    }
 
 
 @login_required
@@ -133,7 +234,7 @@ def update_account(request):
             accounttype = data.get('accounttype')
 
             # 查找账户，确保账户属于当前登录用户
-            account = Account.objects.get(id=account_id, user=request.user)
+            account = Account.objects.get(id=account_id, user=request.user, deleting=False)
 
             # 更新账户信息
             if accountname:
@@ -148,8 +249,9 @@ def update_account(request):
                     })
                 account.accounttype = accounttype
 
-            # 保存修改
-            account.save()
+            # 只写回名称和类型，余额由记账逻辑用 F() 维护，不能用读到的旧值覆盖
+            account.save(update_fields=['accountname', 'accounttype'])
+            cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
@@ -188,22 +290,189 @@ def get_account_details(request):
         try:
             data = json.loads(request.body)
             account_id = data.get('account_id')
-            account = Account.objects.get(id=account_id, user=request.user)
+            return JsonResponse(cache.get_or_build(
+                request.user.id, 'get_account_details',
+                lambda: _account_details_payload(_get_account(request.user, account_id)), account_id
+            ))
+        except json.JSONDecodeError:
             return JsonResponse({
-                "code": 200,
-                "message": "账户信息获取成功",
-                "data": {
-                    "accountname": account.accountname,
-                    "accounttype": account.accounttype,
-                    "accountbalance": str(account.accountbalance)
-                }
+                "code": 400,
+                "message": "JSON 数据格式错误",
+                "data": {}
             })
-        except Account.DoesNotExist:
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+@login_required
+@csrf_exempt
+async def get_account_details_async(request):
+    # get_account_details 的原生异步版本，供 ASGI 部署使用
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            account_id = data.get('account_id')
+            user = await request.auser()
+
+            async def build():
+                try:
+                    account = await Account.objects.aget(id=account_id, user=user, deleting=False)
+                except Account.DoesNotExist:
+                    account = None
+                return _account_details_payload(account)
+
+            return JsonResponse(await cache.aget_or_build(user.id, 'get_account_details', build, account_id))
+        except json.JSONDecodeError:
             return JsonResponse({
-                "code": 404,
-                "message": "账户不存在或不属于当前用户",
+                "code": 400,
+                "message": "JSON 数据格式错误",
+                "data": {}
+            })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+@login_required
+@csrf_exempt
+def get_account_details_batch(request):
+    # 一次查询多个账户的详情，归属校验与取数合并为一条 id__in 查询
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            account_ids = parse_ids(data.get('account_ids'))
+            if account_ids is None:
+                return JsonResponse({
+                    "code": 400,
+                    "message": f"account_ids 必须是 1 到 {DETAILS_BATCH_LIMIT} 个账户 ID 组成的列表",
+                    "data": {}
+                })
+            return JsonResponse(cache.get_or_build(
+                request.user.id, 'get_account_details_batch',
+                lambda: _account_details_batch_payload(request.user, account_ids), ids_key(account_ids)
+            ))
+        except json.JSONDecodeError:
+            return JsonResponse({
+                "code": 400,
+                "message": "JSON 数据格式错误",
+                "data": {}
+            })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+def _account_details_batch_payload(user, account_ids):
+    rows = ACCOUNT_SERIALIZER.serialize(Account.objects.filter(id__in=account_ids, user=user, deleting=False))
+    found = {row["accountid"]: row for row in rows}
+    return {
+        "code": 200,
+        "message": "账户信息获取成功",
+        "data": {
+            "accounts": [found[account_id] for account_id in account_ids if account_id in found],
+            # 不存在或不属于当前用户的账户 ID
+            "missing": [account_id for account_id in account_ids if account_id not in found]
+        }
+    }
+
+
+def _get_account(user, account_id):
+    try:
+        return Account.objects.get(id=account_id, user=user, deleting=False)
+    except Account.DoesNotExist:
+        return None
+
+
+def _account_details_payload(account):
+    if account is None:
+        return {
+            "code": 404,
+            "message": "账户不存在或不属于当前用户",
+            "data": {}
+        }
+    return {
+        "code": 200,
+        "message": "账户信息获取成功",
+        "data": {
+            "accountname": account.accountname,
+            "accounttype": account.accounttype,
+            "accountbalance": str(account.accountbalance)
+        }
+    }
+
+
+@login_required
+@csrf_exempt
+def get_balance_at(request):
+    # 查询账户在某天（含当天）结束时的余额，date 默认为今天
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            account_id = data.get('account_id')
+            try:
+                day = _parse_day(data.get('date'), timezone.localdate())
+            except ValueError:
+                return JsonResponse({
+                    "code": 400,
+                    "message": "无效的日期",
+                    "data": {}
+                })
+            return JsonResponse(cache.get_or_build(
+                request.user.id, 'get_balance_at',
+                lambda: _balance_at_payload(_get_account(request.user, account_id), day), account_id, day
+            ))
+        except json.JSONDecodeError:
+            return JsonResponse({
+                "code": 400,
+                "message": "JSON 数据格式错误",
                 "data": {}
             })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+@login_required
+@csrf_exempt
+def get_balance_series(request):
+    # 查询账户在 [since, until] 内每天的日终余额，默认为截至今天的最近一年
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            account_id = data.get('account_id')
+            try:
+                until = _parse_day(data.get('until'), timezone.localdate())
+                since = _parse_day(data.get('since'), until - datetime.timedelta(days=364))
+            except ValueError:
+                return JsonResponse({
+                    "code": 400,
+                    "message": "无效的日期",
+                    "data": {}
+                })
+            if since > until or (until - since).days >= BALANCE_SERIES_MAX_DAYS:
+                return JsonResponse({
+                    "code": 400,
+                    "message": f"日期范围无效，最多 {BALANCE_SERIES_MAX_DAYS} 天",
+                    "data": {}
+                })
+            return JsonResponse(cache.get_or_build(
+                request.user.id, 'get_balance_series',
+                lambda: _balance_series_payload(_get_account(request.user, account_id), since, until),
+                account_id, since, until
+            ))
         except json.JSONDecodeError:
             return JsonResponse({
                 "code": 400,
@@ -216,3 +485,44 @@ def get_account_details(request):
             "message": "仅支持 POST 请求",
             "data": {}
         })
+
+
+def _parse_day(value, default):
+    if not value:
+        return default
+    day = parse_date(value) if isinstance(value, str) else None
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+def _balance_at_payload(account, day):
+    if account is None:
+        return _account_details_payload(None)
+    end_of_day = timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+    balance = ledger.balance_at(account.id, end_of_day - datetime.timedelta(microseconds=1))
+    return {
+        "code": 200,
+        "message": "余额查询成功",
+        "data": {
+            "accountid": account.id,
+            "date": day.isoformat(),
+            "accountbalance": str(balance)
+        }
+    }
+
+
+def _balance_series_payload(account, since, until):
+    if account is None:
+        return _account_details_payload(None)
+    return {
+        "code": 200,
+        "message": "余额走势查询成功",
+        "data": {
+            "accountid": account.id,
+            "series": [
+                {"date": day.isoformat(), "accountbalance": str(balance)}
+                for day, balance in ledger.daily_balances(account.id, since, until)
+            ]
+        }
+    }
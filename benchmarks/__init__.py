@@ -0,0 +1,8 @@
+"""
+性能基准测试。
+
+基准脚本在独立的测试数据库中运行（按当前 DATABASES 配置创建，结束后销毁），
+不会修改开发数据库。用法示例::
+
+    python -m benchmarks.api --users 2 --accounts 3 --budgets 4 --trades 2000
+"""
@@ -0,0 +1,120 @@
+"""
+消费趋势分析基准：对比 trade.analytics 的向量化实现与逐行处理 Trade 对象的纯 Python 实现，
+输出两者的耗时（取数与计算分开统计）、加速比以及结果是否一致（JSON 格式）。
+
+默认规模为 1 个用户 × 4 个账户 × 250000 笔交易 = 100 万笔交易，分布在最近 3 年内。
+
+    python -m benchmarks.analytics
+    python -m benchmarks.analytics --trades 25000 --period day
+"""
+import argparse
+import time
+
+from .utils import add_output_argument, benchmark_database, environment, setup_django, write_report
+
+
+def python_trend(trades, period, start, end, window, horizon):
+    """纯 Python 基线：逐行实例化 Trade，用 dict 分组累加，再逐组循环计算移动平均与线性拟合。"""
+    from django.utils import timezone
+
+    from trade import analytics
+
+    count = analytics.period_count(start, end, period)
+    labels = analytics.period_labels(start, count, period)
+    positions = {label: position for position, label in enumerate(labels)}
+    series = {}
+    for trade in trades.iterator(chunk_size=5000):
+        day = timezone.localdate(trade.created_at)
+        label = day.isoformat() if period == 'day' else day.strftime('%Y-%m')
+        totals = series.setdefault((trade.budget_id, trade.tradetype), [0.0] * count)
+        totals[positions[label]] += float(trade.tradebalance)
+
+    groups = []
+    x_mean = (count - 1) / 2
+    denominator = sum((x - x_mean) ** 2 for x in range(count))
+    for (budget_id, tradetype), totals in sorted(series.items()):
+        moving = [None] * count
+        for position in range(window - 1, count):
+            moving[position] = sum(totals[position - window + 1:position + 1]) / window
+        y_mean = sum(totals) / count
+        slope = sum((x - x_mean) * (y - y_mean) for x, y in enumerate(totals)) / denominator if denominator else 0.0
+        intercept = y_mean - slope * x_mean
+        groups.append({
+            "budget_id": budget_id,
+            "tradetype": tradetype,
+            "totals": [f'{value:.2f}' for value in totals],
+            "moving_average": [None if value is None else f'{value:.2f}' for value in moving],
+            "slope": f'{slope:.2f}',
+            "forecast": [f'{intercept + slope * (count + step):.2f}' for step in range(horizon)],
+        })
+    return groups
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def run(options):
+    import datetime
+
+    from django.utils import timezone
+
+    from benchmarks.seed import seed_data
+    from trade import analytics
+
+    with benchmark_database():
+        user = seed_data(users=1, accounts=options.accounts, budgets=options.budgets,
+                         trades=options.trades, seed=options.seed, days=options.days)[0]
+        until = timezone.localdate()
+        start, end = analytics.period_range(until - datetime.timedelta(days=options.days), until, options.period)
+        trades = analytics.user_trades(user, start, end)
+        args = (options.period, start, end, options.window, options.horizon)
+
+        runs = []
+        for _ in range(options.repeat):
+            columns, load_ms = _timed(analytics.load_columns, trades)
+            vectorized, compute_ms = _timed(analytics.trend, columns, *args)
+            baseline, baseline_ms = _timed(python_trend, trades, *args)
+            runs.append({"vectorized_load_ms": load_ms, "vectorized_compute_ms": compute_ms,
+                         "vectorized_total_ms": round(load_ms + compute_ms, 1), "python_ms": baseline_ms})
+
+    best = {key: min(run[key] for run in runs) for key in runs[0]}
+    return {
+        "benchmark": "analytics",
+        "environment": environment(),
+        "config": {
+            "trades": options.accounts * options.trades, "accounts": options.accounts, "budgets": options.budgets,
+            "days": options.days, "period": options.period, "window": options.window, "horizon": options.horizon,
+            "repeat": options.repeat,
+        },
+        "groups": len(vectorized["groups"]),
+        "results_match": vectorized["groups"] == baseline,
+        "best": best,
+        "speedup": round(best["python_ms"] / best["vectorized_total_ms"], 2),
+        "compute_speedup": round(best["python_ms"] / max(best["vectorized_compute_ms"], 0.1), 1),
+        "runs": runs,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='向量化趋势分析与纯 Python 实现的耗时对比')
+    parser.add_argument('--accounts', type=int, default=4, help='账户数')
+    parser.add_argument('--budgets', type=int, default=5, help='每个账户的预算数')
+    parser.add_argument('--trades', type=int, default=250000, help='每个账户的交易数')
+    parser.add_argument('--days', type=int, default=3 * 365, help='交易时间分布的天数')
+    parser.add_argument('--period', choices=['day', 'month'], default='month', help='周期粒度')
+    parser.add_argument('--window', type=int, default=3, help='移动平均窗口')
+    parser.add_argument('--horizon', type=int, default=3, help='预测周期数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最好成绩')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
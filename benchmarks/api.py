@@ -0,0 +1,262 @@
+"""
+JSON 接口延迟基准：按配置规模写入数据后，用 Django 测试客户端依次驱动
+userpro、account、budget、trade 及项目级的每个 URL，输出 p50/p95/p99 延迟、
+每请求查询数与峰值内存（JSON 格式）。
+
+    python -m benchmarks.api --users 2 --accounts 3 --budgets 4 --trades 2000 --output bench.json
+"""
+import argparse
+import itertools
+import json
+import time
+import tracemalloc
+
+from .utils import (add_output_argument, add_seed_arguments, benchmark_database, environment,
+                    latency_summary, setup_django, write_report)
+
+# 需要压测的应用 URL 前缀，admin 不在范围内
+APP_NAMESPACES = ('userpro.urls', 'account.urls', 'budget.urls', 'trade.urls')
+
+
+class Context:
+    def __init__(self, user):
+        from django.test import Client
+
+        from account.models import Account
+        from budget.models import Budget
+
+        self.user = user
+        self.client = Client()
+        self.client.force_login(user)
+        self.anonymous = Client()
+        self.account = Account.objects.filter(user=user).order_by('id').first()
+        self.budget = Budget.objects.filter(account=self.account).order_by('id').first()
+        self.counter = itertools.count()
+
+    def unique(self, prefix):
+        return f'{prefix}{next(self.counter)}'
+
+
+def _trade_payload(ctx, tradebalance='0.01'):
+    return {'account_id': ctx.account.id, 'budget_id': ctx.budget.id,
+            'tradebalance': tradebalance, 'tradetype': 'Dining', 'traderemark': '基准'}
+
+
+def _fresh_account(ctx):
+    from account.models import Account
+    return Account.objects.create(user=ctx.user, accountname=ctx.unique('待删除'), accounttype='bank').id
+
+
+def _fresh_budget(ctx):
+    from budget.models import Budget
+    return Budget.objects.create(account=ctx.account, budgetname=ctx.unique('待删除'), budgettype='Gifts').id
+
+
+def _fresh_trade(ctx):
+    from trade.models import Trade
+    return Trade.objects.create(account=ctx.account, budget=ctx.budget, tradebalance='0.01',
+                                tradetype='Dining').id
+
+
+def _account_ids(ctx):
+    from FinanceManageSystem.batch import DETAILS_BATCH_LIMIT
+    return list(ctx.user.accounts.order_by('id').values_list('id', flat=True)[:DETAILS_BATCH_LIMIT])
+
+
+def _budget_ids(ctx):
+    from budget.models import Budget
+    from FinanceManageSystem.batch import DETAILS_BATCH_LIMIT
+    return list(Budget.objects.filter(account__user=ctx.user).order_by('id')
+                .values_list('id', flat=True)[:DETAILS_BATCH_LIMIT])
+
+
+def _days_ago(days):
+    import datetime
+    from django.utils import timezone
+    return (timezone.localdate() - datetime.timedelta(days=days)).isoformat()
+
+
+def _logged_in_client(ctx):
+    from django.test import Client
+    client = Client()
+    client.force_login(ctx.user)
+    return client
+
+
+# URL 名称 -> 准备函数；准备函数在计时之外执行，返回 (客户端, 请求方法, 请求数据)
+SCENARIOS = {
+    # userpro
+    'user_profile': lambda ctx: (ctx.anonymous, 'post', {
+        'username': ctx.unique('reg'), 'password': 'benchmark-password', 'email': f"{ctx.unique('reg')}@example.com"}),
+    'login': lambda ctx: (ctx.anonymous, 'post', {'username': ctx.user.username, 'password': 'benchmark-password'}),
+    'update_profile': lambda ctx: (ctx.client, 'post', {'nickname': ctx.unique('昵称')}),
+    'get_user_info': lambda ctx: (ctx.client, 'get', None),
+    'get_user_info_async': lambda ctx: (ctx.client, 'get', None),
+    'logout': lambda ctx: (_logged_in_client(ctx), 'get', None),
+    # account
+    'add_account': lambda ctx: (ctx.client, 'post', {'accountname': ctx.unique('账户'), 'accounttype': 'bank'}),
+    'delete_account': lambda ctx: (ctx.client, 'post', {'account_id': _fresh_account(ctx)}),
+    'get_user_accounts': lambda ctx: (ctx.client, 'get', None),
+    'get_user_accounts_async': lambda ctx: (ctx.client, 'get', None),
+    'update_account': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id, 'accountname': ctx.unique('账户')}),
+    'get_account_details': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id}),
+    'get_account_details_async': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id}),
+    'get_account_details_batch': lambda ctx: (ctx.client, 'post', {'account_ids': _account_ids(ctx)}),
+    'get_balance_at': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id, 'date': _days_ago(30)}),
+    'get_balance_series': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id}),
+    # budget
+    'add_budget': lambda ctx: (ctx.client, 'post', {'account_id': ctx.account.id, 'budgetname': ctx.unique('预算'),
+                                                    'budgettype': 'Gifts', 'budgetbalance': '100'}),
+    'delete_budget': lambda ctx: (ctx.client, 'post', {'budget_id': _fresh_budget(ctx)}),
+    'update_budget': lambda ctx: (ctx.client, 'post', {'budget_id': ctx.budget.id, 'budgetname': ctx.unique('预算')}),
+    'get_user_budgets': lambda ctx: (ctx.client, 'get', None),
+    'get_user_budgets_async': lambda ctx: (ctx.client, 'get', None),
+    'get_budget_detail': lambda ctx: (ctx.client, 'post', {'budget_id': ctx.budget.id, 'account_id': ctx.account.id}),
+    'get_budget_details_batch': lambda ctx: (ctx.client, 'post', {'budget_ids': _budget_ids(ctx)}),
+    # trade
+    'add_trade': lambda ctx: (ctx.client, 'post', _trade_payload(ctx)),
+    'bulk_add_trades': lambda ctx: (ctx.client, 'post', {'trades': [_trade_payload(ctx)] * 100}),
+    'delete_trade': lambda ctx: (ctx.client, 'post', {'trade_id': _fresh_trade(ctx), 'restore_balance': True}),
+    'get_trades': lambda ctx: (ctx.client, 'get', {}),
+    'get_trades_async': lambda ctx: (ctx.client, 'get', {}),
+    'export_trades': lambda ctx: (ctx.client, 'get', {'format': 'ndjson'}),
+    'trade_summary': lambda ctx: (ctx.client, 'get', {'group_by': 'tradetype,budget'}),
+    'spending_report': lambda ctx: (ctx.client, 'get', {'period': 'month', 'group_by': 'tradetype'}),
+    'spending_trend': lambda ctx: (ctx.client, 'get', {'period': 'month'}),
+    # 项目级
+    'cache_stats': lambda ctx: (ctx.client, 'get', None),
+    'request_metrics': lambda ctx: (ctx.client, 'get', None),
+}
+
+
+def url_names():
+    """返回需要压测的全部 URL 名称及路径，顺序与 urls.py 中的声明一致。"""
+    from django.urls import URLPattern, URLResolver, get_resolver
+
+    names = {}
+
+    def collect(patterns, prefix):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                if getattr(pattern.urlconf_module, '__name__', None) in APP_NAMESPACES:
+                    collect(pattern.url_patterns, prefix + str(pattern.pattern))
+            elif isinstance(pattern, URLPattern) and pattern.name:
+                names[pattern.name] = '/' + prefix + str(pattern.pattern)
+
+    collect(get_resolver().url_patterns, '')
+    return names
+
+
+def _send(client, method, path, data):
+    if method == 'get':
+        response = client.get(path, data)
+    else:
+        response = client.post(path, json.dumps(data), content_type='application/json')
+    if response.streaming:
+        body = b''.join(response.streaming_content)
+        ok = response.status_code == 200
+    else:
+        body = response.content
+        ok = response.status_code == 200 and json.loads(body).get('code') == 200
+    return ok, len(body)
+
+
+def run_endpoint(ctx, path, prepare, iterations, warmup, profile_iterations):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    for _ in range(warmup):
+        client, method, data = prepare(ctx)
+        _send(client, method, path, data)
+
+    # 计时：不开启 tracemalloc 和查询捕获，避免影响延迟
+    samples, errors, sizes = [], 0, []
+    for _ in range(iterations):
+        client, method, data = prepare(ctx)
+        start = time.perf_counter()
+        ok, size = _send(client, method, path, data)
+        samples.append((time.perf_counter() - start) * 1000)
+        errors += not ok
+        sizes.append(size)
+
+    # 剖析：统计每请求查询数与峰值内存
+    queries, peaks = [], []
+    tracemalloc.start()
+    try:
+        for _ in range(profile_iterations):
+            client, method, data = prepare(ctx)
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            with CaptureQueriesContext(connection) as captured:
+                _send(client, method, path, data)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            queries.append(len(captured))
+    finally:
+        tracemalloc.stop()
+
+    result = latency_summary(samples)
+    result.update({
+        "errors": errors,
+        "response_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+        "queries_per_request": round(sum(queries) / len(queries), 2) if queries else None,
+        "peak_memory_kb": round(max(peaks) / 1024, 1) if peaks else None,
+    })
+    return result
+
+
+def run(options):
+    from benchmarks.seed import seed_data
+    from django.core.cache import cache
+
+    with benchmark_database():
+        started = time.perf_counter()
+        users = seed_data(users=options.users, accounts=options.accounts, budgets=options.budgets,
+                          trades=options.trades, seed=options.seed, ledger=True)
+        seed_seconds = time.perf_counter() - started
+
+        user = users[0]
+        user.is_staff = True
+        user.save(update_fields=['is_staff'])
+        ctx = Context(user)
+
+        endpoints = {}
+        for name, path in url_names().items():
+            if options.only and name not in options.only:
+                continue
+            prepare = SCENARIOS.get(name)
+            if prepare is None:
+                endpoints[name] = {"path": path, "skipped": "没有对应的压测场景"}
+                continue
+            cache.clear()
+            result = run_endpoint(ctx, path, prepare, options.iterations, options.warmup,
+                                  options.profile_iterations)
+            endpoints[name] = {"path": path, **result}
+
+        return {
+            "benchmark": "api",
+            "environment": environment(),
+            "config": {
+                "users": options.users, "accounts": options.accounts, "budgets": options.budgets,
+                "trades": options.trades, "iterations": options.iterations, "warmup": options.warmup,
+                "profile_iterations": options.profile_iterations, "seed_seconds": round(seed_seconds, 3),
+            },
+            "endpoints": endpoints,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='JSON 接口延迟基准')
+    add_seed_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=50, help='每个接口的计时请求数')
+    parser.add_argument('--warmup', type=int, default=3, help='每个接口的预热请求数')
+    parser.add_argument('--profile-iterations', type=int, default=5, help='统计查询数与内存的请求数')
+    parser.add_argument('--only', nargs='*', help='只压测指定的 URL 名称')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
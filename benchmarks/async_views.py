@@ -0,0 +1,110 @@
+"""
+同步与原生异步读接口在 ASGI 下的吞吐对比：对每组接口以相同并发度发送请求，
+输出每秒请求数与延迟分布（JSON 格式）。
+
+    python -m benchmarks.async_views --concurrency 32 --requests 500
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from .utils import (add_output_argument, add_seed_arguments, benchmark_database, environment,
+                    latency_summary, setup_django, write_report)
+
+# (同步路径, 异步路径, 请求方法)
+ENDPOINT_PAIRS = [
+    ('/trade/get_trades/', '/trade/get_trades_async/', 'get'),
+    ('/account/get_user_accounts/', '/account/get_user_accounts_async/', 'get'),
+    ('/budget/get_user_budgets/', '/budget/get_user_budgets_async/', 'get'),
+    ('/account/get_account_details/', '/account/get_account_details_async/', 'post'),
+    ('/userpro/get_user_info/', '/userpro/get_user_info_async/', 'get'),
+]
+
+
+async def _drive(client, path, method, body, total, concurrency):
+    # 以固定并发度发送 total 个请求，返回吞吐与延迟
+    samples = []
+    errors = 0
+    queue = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in queue:
+            start = time.perf_counter()
+            if method == 'get':
+                response = await client.get(path)
+            else:
+                response = await client.post(path, body, content_type='application/json')
+            samples.append((time.perf_counter() - start) * 1000)
+            errors += response.status_code != 200 or json.loads(response.content).get('code') != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    result = latency_summary(samples)
+    result.update({"errors": errors, "requests_per_second": round(total / elapsed, 1)})
+    return result
+
+
+async def _compare(user, account_id, options):
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    await client.aforce_login(user)
+    body = json.dumps({'account_id': account_id})
+
+    results = {}
+    for sync_path, async_path, method in ENDPOINT_PAIRS:
+        # 预热（同时填充读缓存），然后交替测量同步与异步版本
+        for path in (sync_path, async_path):
+            await _drive(client, path, method, body, options.warmup, 1)
+        sync_result = await _drive(client, sync_path, method, body, options.requests, options.concurrency)
+        async_result = await _drive(client, async_path, method, body, options.requests, options.concurrency)
+        results[sync_path] = {
+            "sync": sync_result,
+            "async": {"path": async_path, **async_result},
+            "speedup": round(async_result["requests_per_second"] / sync_result["requests_per_second"], 3),
+        }
+    return results
+
+
+def run(options):
+    from asgiref.sync import async_to_sync
+
+    from account.models import Account
+    from benchmarks.seed import seed_data
+
+    with benchmark_database():
+        users = seed_data(users=options.users, accounts=options.accounts, budgets=options.budgets,
+                          trades=options.trades, seed=options.seed)
+        user = users[0]
+        account_id = Account.objects.filter(user=user).values_list('id', flat=True).first()
+        endpoints = async_to_sync(_compare)(user, account_id, options)
+
+    return {
+        "benchmark": "async_views",
+        "environment": environment(),
+        "config": {
+            "users": options.users, "accounts": options.accounts, "budgets": options.budgets,
+            "trades": options.trades, "requests": options.requests, "concurrency": options.concurrency,
+        },
+        "endpoints": endpoints,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='同步与异步读接口吞吐对比')
+    add_seed_arguments(parser)
+    parser.add_argument('--requests', type=int, default=300, help='每个接口的请求数')
+    parser.add_argument('--concurrency', type=int, default=16, help='并发请求数')
+    parser.add_argument('--warmup', type=int, default=5, help='每个接口的预热请求数')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+删除账户基准：对比 Model.delete() 的一次性级联删除与 account.deletion 的分批删除，
+输出总耗时、最长单条 SQL 耗时（即一次持有写锁的最长时间）与 SQL 条数（JSON 格式）。
+
+    python -m benchmarks.deletion
+    python -m benchmarks.deletion --trades 500000 --chunk-size 10000
+"""
+import argparse
+import time
+
+from .utils import add_output_argument, benchmark_database, environment, setup_django, write_report
+
+
+def _measure(func):
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    start = time.perf_counter()
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    elapsed = time.perf_counter() - start
+    durations = [float(query['time']) for query in ctx.captured_queries]
+    return {
+        "total_ms": round(elapsed * 1000, 1),
+        "longest_statement_ms": round(max(durations) * 1000, 1),
+        "statements": len(durations),
+    }
+
+
+def run(options):
+    from account import deletion
+    from account.models import Account
+    from benchmarks.seed import seed_data
+
+    with benchmark_database():
+        user = seed_data(users=1, accounts=2, budgets=options.budgets, trades=options.trades, seed=options.seed)[0]
+        cascade, chunked = Account.objects.filter(user=user).order_by('id')
+        results = {
+            "cascade": _measure(cascade.delete),
+            "chunked": _measure(lambda: deletion.purge_account(chunked.id, options.chunk_size)),
+        }
+
+    return {
+        "benchmark": "deletion",
+        "environment": environment(),
+        "config": {"trades": options.trades, "budgets": options.budgets, "chunk_size": options.chunk_size},
+        **results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='级联删除与分批删除账户的耗时对比')
+    parser.add_argument('--trades', type=int, default=200000, help='每个账户的交易数')
+    parser.add_argument('--budgets', type=int, default=5, help='每个账户的预算数')
+    parser.add_argument('--chunk-size', type=int, default=5000, help='每批删除的行数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
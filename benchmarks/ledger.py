@@ -0,0 +1,93 @@
+"""
+账户流水基准：批量写入流水后测量 reconcile_ledger 全量对账、snapshot_balances 生成快照
+以及快照前后 balance_at 查询的耗时（JSON 格式）。
+
+    python -m benchmarks.ledger --entries 10000000 --accounts 10000
+    python -m benchmarks.ledger --entries 1000000
+"""
+import argparse
+import random
+import time
+from decimal import Decimal
+
+from .utils import add_output_argument, benchmark_database, environment, setup_django, write_report
+
+BATCH_SIZE = 50000
+
+
+def seed_ledger(accounts, entries, seed=42):
+    """为 accounts 个账户写入共 entries 条流水，并把账户余额设为流水合计。"""
+    from django.contrib.auth import get_user_model
+    from django.db.models import OuterRef, Subquery, Sum
+
+    from account.models import Account, LedgerEntry
+
+    rng = random.Random(seed)
+    user = get_user_model().objects.create(username='ledger-bench')
+    Account.objects.bulk_create([Account(user=user, accountname=f'账户{i}', accounttype='bank')
+                                 for i in range(accounts)], batch_size=5000)
+    account_ids = list(Account.objects.filter(user=user).values_list('id', flat=True))
+
+    written = 0
+    while written < entries:
+        batch = min(BATCH_SIZE, entries - written)
+        LedgerEntry.objects.bulk_create([
+            LedgerEntry(account_id=rng.choice(account_ids), amount=Decimal(rng.randint(-5000, 10000)) / 100,
+                        entry_type='trade', counterparty='Dining')
+            for _ in range(batch)
+        ], batch_size=5000)
+        written += batch
+
+    totals = LedgerEntry.objects.filter(account=OuterRef('pk')).order_by().values('account').annotate(
+        total=Sum('amount')).values('total')
+    Account.objects.filter(user=user).update(accountbalance=Subquery(totals))
+    return account_ids
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, round((time.perf_counter() - start) * 1000, 1)
+
+
+def run(options):
+    from account import ledger
+
+    with benchmark_database():
+        account_ids, seed_ms = _timed(seed_ledger, options.accounts, options.entries, options.seed)
+        account_id = account_ids[0]
+        _, before_ms = _timed(ledger.balance_at, account_id)
+        mismatches, reconcile_ms = _timed(lambda: list(ledger.reconcile()))
+        snapshots, snapshot_ms = _timed(ledger.take_snapshots, options.interval, 0)
+        _, after_ms = _timed(ledger.balance_at, account_id)
+
+    return {
+        "benchmark": "ledger",
+        "environment": environment(),
+        "config": {"entries": options.entries, "accounts": options.accounts, "interval": options.interval},
+        "seed_ms": seed_ms,
+        "reconcile_ms": reconcile_ms,
+        "reconcile_entries_per_second": round(options.entries / (reconcile_ms / 1000)) if reconcile_ms else None,
+        "mismatches": len(mismatches),
+        "snapshot_ms": snapshot_ms,
+        "snapshots": snapshots,
+        "balance_at_without_snapshot_ms": before_ms,
+        "balance_at_with_snapshot_ms": after_ms,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='账户流水对账与余额快照基准')
+    parser.add_argument('--entries', type=int, default=1000000, help='流水总条数')
+    parser.add_argument('--accounts', type=int, default=1000, help='账户数')
+    parser.add_argument('--interval', type=int, default=100, help='快照间隔（流水条数）')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+登录吞吐基准：对每种密码哈希策略分别测量单次密码校验耗时与 login 接口的每秒登录数
+（单线程，即单核吞吐），输出 JSON 格式结果。成本参数取自 settings.PASSWORD_HASHER_COST，
+可通过 FMS_PBKDF2_ITERATIONS、FMS_SCRYPT_WORK_FACTOR 等环境变量调整后对比。
+
+    python -m benchmarks.login --logins 20
+    FMS_PBKDF2_ITERATIONS=600000 python -m benchmarks.login --policy pbkdf2
+"""
+import argparse
+import json
+import time
+
+from .utils import add_output_argument, benchmark_database, environment, latency_summary, setup_django, write_report
+
+# 策略名 -> 哈希器类名
+POLICIES = {
+    'pbkdf2': 'PBKDF2PasswordHasher',
+    'scrypt': 'ScryptPasswordHasher',
+    'argon2': 'Argon2PasswordHasher',
+}
+
+
+def _available(policy):
+    if policy != 'argon2':
+        return True
+    try:
+        import argon2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def run_policy(policy, options):
+    from django.conf import settings
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import get_hasher
+    from django.test import Client, override_settings
+
+    from benchmarks.seed import PASSWORD
+
+    # 将待测策略排在首位，新密码和登录时的重新哈希均使用该策略
+    hashers = [path for path in settings.PASSWORD_HASHERS if path.endswith(f'.{POLICIES[policy]}')]
+    with override_settings(PASSWORD_HASHERS=hashers + [p for p in settings.PASSWORD_HASHERS if p not in hashers]):
+        hasher = get_hasher()
+        encoded = hasher.encode(PASSWORD, hasher.salt())
+
+        verify_samples = []
+        for _ in range(options.verifies):
+            start = time.perf_counter()
+            hasher.verify(PASSWORD, encoded)
+            verify_samples.append((time.perf_counter() - start) * 1000)
+
+        user = get_user_model().objects.create(username=f'login-{policy}', password=encoded)
+        body = json.dumps({'username': user.username, 'password': PASSWORD})
+        login_samples = []
+        errors = 0
+        started = time.perf_counter()
+        for _ in range(options.logins):
+            client = Client()
+            start = time.perf_counter()
+            response = client.post('/userpro/login/', body, content_type='application/json')
+            login_samples.append((time.perf_counter() - start) * 1000)
+            errors += response.json().get('code') != 200
+        elapsed = time.perf_counter() - started
+
+    verify = latency_summary(verify_samples)
+    verify["verifies_per_second"] = round(1000 * len(verify_samples) / sum(verify_samples), 2)
+    login = latency_summary(login_samples)
+    login.update({"errors": errors, "logins_per_second": round(len(login_samples) / elapsed, 2)})
+    return {"policy": policy, "algorithm": hasher.algorithm, "params": _params(hasher, encoded),
+            "verify": verify, "login": login}
+
+
+def _params(hasher, encoded):
+    summary = hasher.safe_summary(encoded)
+    return {key: value for key, value in summary.items() if key not in ('salt', 'hash')}
+
+
+def run(options):
+    policies = [policy for policy in options.policy or POLICIES if _available(policy)]
+    with benchmark_database():
+        results = [run_policy(policy, options) for policy in policies]
+    return {
+        "benchmark": "login",
+        "environment": environment(),
+        "config": {"verifies": options.verifies, "logins": options.logins},
+        "policies": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='各密码哈希策略的登录吞吐基准')
+    parser.add_argument('--policy', action='append', choices=POLICIES, help='只测指定策略，可重复')
+    parser.add_argument('--verifies', type=int, default=10, help='每种策略的密码校验次数')
+    parser.add_argument('--logins', type=int, default=10, help='每种策略的登录请求数')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+import random
+from io import StringIO
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
+
+from account.ledger import take_snapshots
+from account.models import Account, LedgerEntry
+from budget.models import Budget
+from trade.models import Trade
+from trade.services import EXPENSE_TYPES
+
+# 种子用户的统一密码
+PASSWORD = 'benchmark-password'
+
+BATCH_SIZE = 5000
+
+
+def seed_data(users=2, accounts=3, budgets=4, trades=1000, seed=42, days=365, ledger=False):
+    """
+    按 用户 × 账户 × 预算 × 交易 的规模批量写入基准数据，返回创建的用户列表。
+
+    accounts 为每个用户的账户数，budgets 和 trades 分别为每个账户的预算数和交易数，
+    交易时间均匀分布在最近 days 天内。ledger 为 True 时同时写入账户流水并生成余额快照。
+    """
+    rng = random.Random(seed)
+    User = get_user_model()
+    # 所有用户共用一个密码哈希，避免为每个用户重复计算
+    password = make_password(PASSWORD)
+    created_users = User.objects.bulk_create([
+        User(username=f'bench{i}', email=f'bench{i}@example.com', password=password)
+        for i in range(users)
+    ])
+    created_users = list(User.objects.filter(username__in=[user.username for user in created_users]))
+
+    created_accounts = Account.objects.bulk_create([
+        Account(user=user, accountname=f'账户{i}', accounttype=rng.choice(Account.ACCOUNT_TYPE_CHOICES)[0],
+                accountbalance=Decimal('100000000.00'))
+        for user in created_users for i in range(accounts)
+    ])
+    created_accounts = list(Account.objects.filter(user__in=created_users))
+
+    budget_types = [choice for choice, _ in Budget.BUDGET_TYPE_CHOICES]
+    Budget.objects.bulk_create([
+        Budget(account=account, budgetname=f'预算{i}', budgettype=rng.choice(budget_types),
+               budgetbalance=Decimal('10000.00'))
+        for account in created_accounts for i in range(budgets)
+    ])
+    budgets_by_account = {}
+    for budget_id, account_id in Budget.objects.filter(account__in=created_accounts).values_list('id', 'account_id'):
+        budgets_by_account.setdefault(account_id, []).append(budget_id)
+
+    trade_types = [choice for choice, _ in Trade.TRADE_TYPE_CHOICES]
+    now = timezone.now()
+    batch = []
+    for account in created_accounts:
+        budget_ids = budgets_by_account.get(account.id)
+        if not budget_ids:
+            continue
+        for _ in range(trades):
+            batch.append(Trade(
+                account_id=account.id,
+                budget_id=rng.choice(budget_ids),
+                tradebalance=Decimal(rng.randint(1, 50000)) / 100,
+                tradetype=rng.choice(trade_types),
+                traderemark='基准数据',
+                created_at=now - timedelta(seconds=rng.randint(0, days * 86400)),
+            ))
+            if len(batch) >= BATCH_SIZE:
+                Trade.objects.bulk_create(batch)
+                batch = []
+    Trade.objects.bulk_create(batch)
+
+    # 直接写库绕过了记账逻辑，这里重建预算计数与交易汇总
+    call_command('rebuild_budget_counters', stdout=StringIO())
+    call_command('rebuild_trade_rollups', stdout=StringIO())
+    if ledger:
+        seed_ledger(created_accounts, now - timedelta(days=days, seconds=1))
+    return created_users
+
+
+def seed_ledger(accounts, opened_at):
+    """
+    按交易时间顺序为账户补写流水（期初余额 + 每笔交易），再把账户余额设为流水合计并生成快照。
+
+    流水 ID 与时间同序写入，快照之后的流水才恰好是快照时点之后的流水。
+    """
+    LedgerEntry.objects.bulk_create([
+        LedgerEntry(account_id=account.id, amount=account.accountbalance, entry_type='opening', created_at=opened_at)
+        for account in accounts
+    ], batch_size=BATCH_SIZE)
+
+    trades = Trade.objects.filter(account__in=accounts).order_by('created_at', 'id').values_list(
+        'id', 'account_id', 'tradebalance', 'tradetype', 'created_at')
+    batch = []
+    for trade_id, account_id, tradebalance, tradetype, created_at in trades.iterator(chunk_size=BATCH_SIZE):
+        batch.append(LedgerEntry(
+            account_id=account_id, amount=-tradebalance if tradetype in EXPENSE_TYPES else tradebalance,
+            entry_type='trade', counterparty=tradetype, trade_id=trade_id, created_at=created_at,
+        ))
+        if len(batch) >= BATCH_SIZE:
+            LedgerEntry.objects.bulk_create(batch)
+            batch = []
+    LedgerEntry.objects.bulk_create(batch)
+
+    totals = LedgerEntry.objects.filter(account=OuterRef('pk')).order_by().values('account').annotate(
+        total=Sum('amount')).values('total')
+    Account.objects.filter(id__in=[account.id for account in accounts]).update(accountbalance=Subquery(totals))
+    take_snapshots(lag=0)
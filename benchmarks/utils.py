@@ -0,0 +1,92 @@
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+from contextlib import contextmanager
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'FinanceManageSystem.settings')
+    # 基准测试需要测出接口本身的吞吐，默认关闭写接口限流
+    os.environ.setdefault('FMS_RATE_LIMIT', '0')
+    # 基准测试在单进程中运行，允许认证、会话与接口读缓存使用进程内缓存
+    os.environ.setdefault('FMS_AUTH_CACHE_ALLOW_LOCAL', '1')
+    os.environ.setdefault('FMS_API_CACHE_ALLOW_LOCAL', '1')
+    import django
+    django.setup()
+
+
+@contextmanager
+def benchmark_database(keepdb=False, test_name=None):
+    # 在独立的测试库中运行，测试结束后销毁；test_name 可指定测试库名（如 SQLite 文件路径）
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    if test_name is not None:
+        connection.settings_dict.setdefault('TEST', {})['NAME'] = test_name
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+        teardown_test_environment()
+
+
+def percentile(samples, pct):
+    # 最近秩法计算百分位数
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct * len(ordered) / 100) - 1))
+    return ordered[rank]
+
+
+def latency_summary(samples_ms):
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(sum(samples_ms) / len(samples_ms), 3) if samples_ms else None,
+        "p50_ms": _round(percentile(samples_ms, 50)),
+        "p95_ms": _round(percentile(samples_ms, 95)),
+        "p99_ms": _round(percentile(samples_ms, 99)),
+    }
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def environment():
+    import django
+    from django.db import connection
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "platform": platform.platform(),
+        "database": connection.vendor,
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def add_output_argument(parser):
+    parser.add_argument('--output', help='结果 JSON 的输出路径，默认输出到标准输出')
+
+
+def write_report(report, output=None):
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('--users', type=int, default=2, help='用户数')
+    parser.add_argument('--accounts', type=int, default=3, help='每个用户的账户数')
+    parser.add_argument('--budgets', type=int, default=4, help='每个账户的预算数')
+    parser.add_argument('--trades', type=int, default=1000, help='每个账户的交易数')
+    parser.add_argument('--seed', type=int, default=42, help='随机数种子')
@@ -0,0 +1,137 @@
+"""
+并发写入吞吐基准：多个线程同时通过 add_trade 接口记账，统计每秒成功写入数、
+"database is locked" 等错误数与延迟分布（JSON 格式）。
+
+SQLite 下会分别以默认日志模式（baseline）和 settings 中的 WAL 调优配置（tuned）各跑一轮，
+测试库使用临时文件以便多个连接真正并发；PostgreSQL（FMS_DB_ENGINE=postgres）下按当前
+CONN_MAX_AGE 或连接池配置运行。
+
+    python -m benchmarks.write_throughput --threads 8 --writes 200
+    FMS_DB_ENGINE=postgres FMS_DB_POOL=1 python -m benchmarks.write_throughput
+"""
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .utils import (add_output_argument, benchmark_database, environment, latency_summary, setup_django,
+                    write_report)
+
+# SQLite 对照组：回滚日志模式，默认 DEFERRED 事务
+SQLITE_BASELINE_OPTIONS = {'init_command': 'PRAGMA journal_mode=DELETE'}
+
+
+def _worker(user, payloads, results, barrier):
+    from django.db import connection
+    from django.test import Client
+
+    client = Client(raise_request_exception=False)
+    client.force_login(user)
+    barrier.wait()
+    try:
+        for payload in payloads:
+            start = time.perf_counter()
+            response = client.post('/trade/add_trade/', json.dumps(payload), content_type='application/json')
+            elapsed = (time.perf_counter() - start) * 1000
+            ok = response.status_code == 200 and response.json().get('code') == 200
+            results.append((ok, elapsed))
+    finally:
+        connection.close()
+
+
+def run_profile(name, options):
+    from account.models import Account
+    from benchmarks.seed import seed_data
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_name = os.path.join(tmp, 'bench.sqlite3') if _vendor() == 'sqlite' else None
+        with benchmark_database(test_name=test_name):
+            user = seed_data(users=1, accounts=options.accounts, budgets=1, trades=0)[0]
+            targets = list(Account.objects.filter(user=user).values_list('id', 'budgets__id'))
+
+            results = []
+            barrier = threading.Barrier(options.threads + 1)
+            threads = []
+            for index in range(options.threads):
+                payloads = []
+                for n in range(options.writes):
+                    account_id, budget_id = targets[(index + n) % len(targets)]
+                    payloads.append({'account_id': account_id, 'budget_id': budget_id,
+                                     'tradebalance': '0.01', 'tradetype': 'Dining'})
+                thread = threading.Thread(target=_worker, args=(user, payloads, results, barrier))
+                thread.start()
+                threads.append(thread)
+
+            barrier.wait()
+            started = time.perf_counter()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+    succeeded = [latency for ok, latency in results if ok]
+    result = latency_summary(succeeded)
+    result.update({
+        "profile": name,
+        "writes": len(results),
+        "succeeded": len(succeeded),
+        "errors": len(results) - len(succeeded),
+        "writes_per_second": round(len(succeeded) / elapsed, 1),
+    })
+    return result
+
+
+def _vendor():
+    from django.db import connection
+    return connection.vendor
+
+
+def run(options):
+    from django.conf import settings
+    from django.db import connection
+
+    db = settings.DATABASES['default']
+    if _vendor() == 'sqlite':
+        tuned = dict(db.get('OPTIONS', {}))
+        if not settings.SQLITE_WAL:
+            # 仓库自带的 db.sqlite3 默认不启用 WAL，测试库为临时文件，这里总是按 WAL 配置测试
+            tuned['init_command'] = ';'.join([*settings.SQLITE_WAL_PRAGMAS, tuned['init_command']])
+        profiles = [('sqlite-baseline', SQLITE_BASELINE_OPTIONS), ('sqlite-tuned', tuned)]
+    else:
+        mode = 'pool' if db.get('OPTIONS', {}).get('pool') else f"conn_max_age={db.get('CONN_MAX_AGE', 0)}"
+        profiles = [(f'{_vendor()}-{mode}', db.get('OPTIONS', {}))]
+
+    results = []
+    for name, profile_options in profiles:
+        original = db.get('OPTIONS', {})
+        db['OPTIONS'] = profile_options
+        connection.close()
+        try:
+            results.append(run_profile(name, options))
+        finally:
+            db['OPTIONS'] = original
+            connection.close()
+
+    return {
+        "benchmark": "write_throughput",
+        "environment": environment(),
+        "config": {"threads": options.threads, "writes_per_thread": options.writes, "accounts": options.accounts},
+        "profiles": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='并发写入吞吐基准')
+    parser.add_argument('--threads', type=int, default=8, help='并发写入线程数')
+    parser.add_argument('--writes', type=int, default=100, help='每个线程的写入次数')
+    parser.add_argument('--accounts', type=int, default=2, help='写入分布的账户数，越少竞争越激烈')
+    add_output_argument(parser)
+    options = parser.parse_args(argv)
+
+    setup_django()
+    write_report(run(options), options.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Round
+
+from budget.models import Budget
+from trade.models import Trade
+from trade.services import EXPENSE_TYPES
+
+
+def actual_counters():
+    # 按预算从交易表重新统计已消费金额与交易笔数的子查询
+    trades = Trade.objects.filter(budget=OuterRef('pk')).order_by().values('budget')
+    # SQLite 中 Decimal 以浮点累加，统一四舍五入到两位小数再比较/写回
+    spent = Round(Coalesce(
+        Subquery(trades.annotate(total=Sum('tradebalance', filter=Q(tradetype__in=EXPENSE_TYPES)))
+                 .values('total')),
+        Value(0), output_field=DecimalField(max_digits=15, decimal_places=2),
+    ), 2)
+    trade_count = Coalesce(Subquery(trades.annotate(total=Count('id')).values('total')), Value(0))
+    return spent, trade_count
+
+
+class Command(BaseCommand):
+    help = '根据交易记录重建预算的已消费金额（spent）与交易笔数（trade_count）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true', help='只校验并报告不一致的预算，不做修改')
+
+    def handle(self, *args, **options):
+        spent, trade_count = actual_counters()
+        mismatched = Budget.objects.annotate(actual_spent=spent, actual_count=trade_count).exclude(
+            spent=F('actual_spent'), trade_count=F('actual_count')
+        )
+
+        if options['verify']:
+            count = 0
+            for budget in mismatched.values('id', 'spent', 'actual_spent', 'trade_count', 'actual_count').iterator():
+                count += 1
+                self.stdout.write(
+                    f"预算 {budget['id']}: spent {budget['spent']} != {budget['actual_spent']}, "
+                    f"trade_count {budget['trade_count']} != {budget['actual_count']}"
+                )
+            if count:
+                self.stdout.write(self.style.ERROR(f'{count} 个预算的计数不一致'))
+            else:
+                self.stdout.write(self.style.SUCCESS('所有预算计数一致'))
+            return
+
+        # 单条 UPDATE 重建全部预算计数
+        with transaction.atomic():
+            updated = Budget.objects.update(spent=spent, trade_count=trade_count)
+        self.stdout.write(self.style.SUCCESS(f'已重建 {updated} 个预算的计数'))
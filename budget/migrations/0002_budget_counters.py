@@ -0,0 +1,45 @@
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+# 迁移中不能依赖运行时代码，这里固定消费类交易类型
+EXPENSE_TYPES = [
+    'Dining', 'Transportation', 'Shopping', 'Entertainment', 'Education', 'Health', 'Housing',
+    'Communication', 'Personal Care', 'Insurance', 'Investments', 'Gifts',
+]
+
+
+def backfill_counters(apps, schema_editor):
+    Budget = apps.get_model('budget', 'Budget')
+    Trade = apps.get_model('trade', 'Trade')
+    trades = Trade.objects.filter(budget=OuterRef('pk')).order_by().values('budget')
+    Budget.objects.update(
+        spent=Coalesce(
+            Subquery(trades.annotate(total=Sum('tradebalance', filter=Q(tradetype__in=EXPENSE_TYPES)))
+                     .values('total')),
+            Value(0), output_field=DecimalField(max_digits=15, decimal_places=2),
+        ),
+        trade_count=Coalesce(Subquery(trades.annotate(total=Count('id')).values('total')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('budget', '0001_initial'),
+        ('trade', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='budget',
+            name='spent',
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='budget',
+            name='trade_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
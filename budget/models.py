@@ -27,6 +27,10 @@ class Budget(models.Model):
     # 预算余额
     budgetbalance = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
 
+    # 已消费金额与交易笔数，由记账逻辑增量维护，可用 rebuild_budget_counters 命令重建
+    spent = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    trade_count = models.PositiveIntegerField(default=0)
+
     def __str__(self):
         return f'{self.budgetname} ({self.get_budgettype_display()})'
 
@@ -1,3 +1,140 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from FinanceManageSystem.testing import local_auth_cache
+from account.models import Account
+from trade.models import Trade, TradeRollup
+from .models import Budget
+
+User = get_user_model()
+
+
+class GetUserBudgetsQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='alice', password='pw')
+        self.client.force_login(self.user)
+
+    def _add_budgets(self, count):
+        account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        Budget.objects.bulk_create([
+            Budget(account=account, budgetname=f'预算{i}', budgettype='Shopping') for i in range(count)
+        ])
+
+    def _count_queries(self):
+        # 预算直接通过 ORM 写入，未经过写接口，这里清空读缓存以测量未命中时的查询数
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/budget/get_user_budgets/').json()
+        self.assertEqual(body['code'], 200)
+        return len(ctx), body['data']
+
+    def test_query_count_independent_of_rows(self):
+        self._add_budgets(1)
+        baseline, data = self._count_queries()
+        self.assertEqual(data[0]['accountname'], '工资卡')
+        self._add_budgets(20)
+        queries, data = self._count_queries()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(len(data), 21)
+
+
+class BudgetCountersTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bob', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('100.00'))
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining',
+                                            budgetbalance=Decimal('50.00'))
+        self.client.force_login(self.user)
+
+    def _post(self, url, data):
+        return self.client.post(url, json.dumps(data), content_type='application/json').json()
+
+    def test_counters_follow_add_bulk_and_delete(self):
+        trade = {'account_id': self.account.id, 'budget_id': self.budget.id, 'tradetype': 'Dining'}
+        trade_id = self._post('/trade/add_trade/', dict(trade, tradebalance='10.00'))['data']['trade_id']
+        self._post('/trade/bulk_add_trades/', {'trades': [dict(trade, tradebalance='2.50')] * 2})
+        self.budget.refresh_from_db()
+        self.assertEqual((self.budget.spent, self.budget.trade_count), (Decimal('15.00'), 3))
+
+        self._post('/trade/delete_trade/', {'trade_id': trade_id})
+        data = self._post('/budget/get_budget_detail/', {'budget_id': self.budget.id,
+                                                         'account_id': self.account.id})['data']
+        self.assertEqual((data['spent'], data['trade_count'], data['remaining']), ('5.00', 2, '45.00'))
+
+    def test_rebuild_command_repairs_drift(self):
+        Trade.objects.create(account=self.account, budget=self.budget, tradebalance=Decimal('7.00'),
+                             tradetype='Dining')
+        out = StringIO()
+        call_command('rebuild_budget_counters', '--verify', stdout=out)
+        self.assertIn(f'预算 {self.budget.id}', out.getvalue())
+
+        call_command('rebuild_budget_counters', stdout=StringIO())
+        self.budget.refresh_from_db()
+        self.assertEqual((self.budget.spent, self.budget.trade_count), (Decimal('7.00'), 1))
+        out = StringIO()
+        call_command('rebuild_budget_counters', '--verify', stdout=out)
+        self.assertIn('所有预算计数一致', out.getvalue())
+
+    def test_update_budget_does_not_overwrite_counters(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self._post('/budget/update_budget/', {'budget_id': self.budget.id, 'budgetname': '三餐'})
+        updates = [query['sql'] for query in ctx if query['sql'].startswith('UPDATE "budget_budget"')]
+        self.assertEqual(len(updates), 1)
+        self.assertNotIn('"spent"', updates[0])
+        self.assertNotIn('"trade_count"', updates[0])
+
+    @override_settings(DELETE_CHUNK_SIZE=2)
+    def test_delete_budget_removes_trades_in_chunks(self):
+        trade = {'account_id': self.account.id, 'budget_id': self.budget.id, 'tradetype': 'Dining'}
+        self._post('/trade/bulk_add_trades/', {'trades': [dict(trade, tradebalance='1.00')] * 5})
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self._post('/budget/delete_budget/', {'budget_id': self.budget.id})['code'], 200)
+        self.assertFalse(Budget.objects.filter(id=self.budget.id).exists())
+        self.assertFalse(Trade.objects.exists())
+        self.assertFalse(TradeRollup.objects.exists())
+        # 5 笔交易按每批 2 行分 3 次删除
+        chunks = [query for query in ctx
+                  if query['sql'].startswith('DELETE FROM "trade_trade"') and '"budget_id" = ' in query['sql']]
+        self.assertEqual(len(chunks), 3)
+
+
+@local_auth_cache
+class BudgetDetailsBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='nora', password='pw')
+        account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank')
+        self.budgets = Budget.objects.bulk_create([
+            Budget(account=account, budgetname=f'预算{i}', budgettype='Shopping', budgetbalance=Decimal('100.00'),
+                   spent=Decimal(i)) for i in range(30)
+        ])
+        other = User.objects.create_user(username='oscar', password='pw')
+        other_account = Account.objects.create(user=other, accountname='别人的卡', accounttype='bank')
+        self.other_budget = Budget.objects.create(account=other_account, budgetname='别人的预算', budgettype='Dining')
+        self.client.force_login(self.user)
+
+    def _post(self, budget_ids):
+        return self.client.post('/budget/get_budget_details_batch/', json.dumps({'budget_ids': budget_ids}),
+                                content_type='application/json').json()
+
+    def test_all_details_in_one_query_with_bulk_ownership_check(self):
+        ids = [budget.id for budget in reversed(self.budgets)] + [self.other_budget.id, 999999]
+        self.client.get('/userpro/get_user_info/')
+        with self.assertNumQueries(1):
+            body = self._post(ids)
+        self.assertEqual(body['code'], 200)
+        self.assertEqual([item['budgetid'] for item in body['data']['budgets']], ids[:30])
+        self.assertEqual(body['data']['budgets'][0]['remaining'], '71.00')
+        self.assertEqual(body['data']['missing'], [self.other_budget.id, 999999])
+
+    def test_rejects_invalid_id_lists(self):
+        for ids in ([], ['1'], [True], list(range(101)), 'abc'):
+            self.assertEqual(self._post(ids)['code'], 400, ids)
@@ -6,5 +6,7 @@ urlpatterns = [
     path('delete_budget/', views.delete_budget, name='delete_budget'),
     path('update_budget/', views.update_budget, name='update_budget'),
     path('get_user_budgets/', views.get_user_budgets, name='get_user_budgets'),
+    path('get_user_budgets_async/', views.get_user_budgets_async, name='get_user_budgets_async'),
     path('get_budget_detail/', views.get_budget_detail, name='get_budget_detail'),
+    path('get_budget_details_batch/', views.get_budget_details_batch, name='get_budget_details_batch'),
 ]
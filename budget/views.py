@@ -1,9 +1,27 @@
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from .models import Budget
+from account import deletion
 from account.models import Account
+from FinanceManageSystem import cache
+from FinanceManageSystem.batch import DETAILS_BATCH_LIMIT, ids_key, parse_ids
+from FinanceManageSystem.serializers import RowSerializer
 import json
+from decimal import Decimal
+
+# 预算列表序列化，账户名称和类型通过 JOIN 一次取回
+BUDGET_SERIALIZER = RowSerializer({
+    "budgetid": "id",
+    "budgetname": "budgetname",
+    "budgettype": "budgettype",
+    "budgetbalance": "budgetbalance",
+    "spent": "spent",
+    "trade_count": "trade_count",
+    "accountname": "account__accountname",
+    "accounttype": "account__accounttype",
+}, decimal_fields=["budgetbalance", "spent"])
 
 
 @login_required
@@ -19,7 +37,7 @@ def add_budget(request):
             budgetbalance = data.get('budgetbalance')
 
             try:
-                account = Account.objects.get(id=account_id, user=request.user)
+                account = Account.objects.get(id=account_id, user=request.user, deleting=False)
             except Account.DoesNotExist:
                 return JsonResponse({
                     "code": 404,
@@ -52,6 +70,7 @@ def add_budget(request):
                 budgettype=budgettype,
                 budgetbalance=budgetbalance
             )
+            cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
@@ -88,7 +107,7 @@ def delete_budget(request):
 
             # 查询预算，确保是当前用户的预算
             try:
-                budget = Budget.objects.get(id=budget_id)
+                budget = Budget.objects.get(id=budget_id, account__deleting=False)
             except Budget.DoesNotExist:
                 return JsonResponse({
                     "code": 404,
@@ -104,8 +123,9 @@ def delete_budget(request):
                     "data": {}
                 })
 
-            # 删除预算
-            budget.delete()
+            # 分批删除预算下的交易与汇总，不在一个事务中删除全部交易
+            deletion.purge_budget(budget.id)
+            cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
@@ -141,7 +161,7 @@ def update_budget(request):
 
             # 查询预算，确保是当前用户的预算
             try:
-                budget = Budget.objects.get(id=budget_id)
+                budget = Budget.objects.get(id=budget_id, account__deleting=False)
             except Budget.DoesNotExist:
                 return JsonResponse({
                     "code": 404,
@@ -158,15 +178,20 @@ def update_budget(request):
                 })
 
             # 更新预算信息
+            updated_fields = []
             if budgetname:
                 budget.budgetname = budgetname
+                updated_fields.append('budgetname')
             if budgettype:
                 budget.budgettype = budgettype
+                updated_fields.append('budgettype')
             if budgetbalance is not None:
                 budget.budgetbalance = budgetbalance
+                updated_fields.append('budgetbalance')
 
-            # 保存更新后的预算
-            budget.save()
+            # 只写回修改的字段，spent/trade_count 由记账逻辑用 F() 维护，不能用读到的旧值覆盖
+            budget.save(update_fields=updated_fields)
+            cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
@@ -195,30 +220,42 @@ def update_budget(request):
 
 @login_required
 @csrf_exempt
+@condition(etag_func=cache.user_etag('get_user_budgets'))
 def get_user_budgets(request):
-    budgets = Budget.objects.filter(account__user=request.user)
-    if not budgets.exists():
-        return JsonResponse({
+    budgets = Budget.objects.filter(account__user=request.user, account__deleting=False)
+    return JsonResponse(cache.get_or_build(request.user.id, 'get_user_budgets',
+                                           lambda: _user_budgets_payload(BUDGET_SERIALIZER.serialize(budgets))))
+
+
+@login_required
+@csrf_exempt
+@cache.async_user_etag('get_user_budgets')
+async def get_user_budgets_async(request):
+    # get_user_budgets 的原生异步版本，供 ASGI 部署使用
+    user = await request.auser()
+
+    async def build():
+        budgets = Budget.objects.filter(account__user=user, account__deleting=False)
+        return _user_budgets_payload(await BUDGET_SERIALIZER.aserialize(budgets))
+
+    return JsonResponse(await cache.aget_or_build(user.id, 'get_user_budgets', build))
+
+
+def _user_budgets_payload(budget_list):
+    if not budget_list:
+        return {
             "code": 404,
             "message": "当前用户没有预算",
             "data": {}
-        })
-    budget_list = []
-    for budget in budgets:
-        budget_list.append({
-            "budgetid": budget.id,
-            "budgetname": budget.budgetname,
-            "budgettype": budget.budgettype,
-            "budgetbalance": str(budget.budgetbalance),
-            "accountname": budget.account.accountname,
-            "accounttype": budget.account.accounttype,
-        })
+        }
+    for item in budget_list:
+        item["remaining"] = _remaining(item["budgetbalance"], item["spent"])
 
-    return JsonResponse({
+    return {
         "code": 200,
         "message": "获取用户预算记录成功",
         "data": budget_list
-    })
+    }
 
 
 @login_required
@@ -228,7 +265,7 @@ def get_budget_detail(request):
         try:
             data = json.loads(request.body)
             budget_id = data.get('budget_id')
-            accounts = Account.objects.filter(user=request.user)
+            accounts = Account.objects.filter(user=request.user, deleting=False)
             if not accounts:
                 return JsonResponse({
                     "code": 404,
@@ -256,7 +293,10 @@ def get_budget_detail(request):
                 "data": {
                     "budgetname": budget.budgetname,
                     "budgettype": budget.budgettype,
-                    "budgetbalance": str(budget.budgetbalance)
+                    "budgetbalance": str(budget.budgetbalance),
+                    "spent": str(budget.spent),
+                    "trade_count": budget.trade_count,
+                    "remaining": _remaining(budget.budgetbalance, budget.spent)
                 }
             })
         except Budget.DoesNotExist:
@@ -279,3 +319,56 @@ def get_budget_detail(request):
         })
 
 
+@login_required
+@csrf_exempt
+def get_budget_details_batch(request):
+    # 一次查询多个预算的详情，归属校验与取数合并为一条 id__in 查询
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            budget_ids = parse_ids(data.get('budget_ids'))
+            if budget_ids is None:
+                return JsonResponse({
+                    "code": 400,
+                    "message": f"budget_ids 必须是 1 到 {DETAILS_BATCH_LIMIT} 个预算 ID 组成的列表",
+                    "data": {}
+                })
+            return JsonResponse(cache.get_or_build(
+                request.user.id, 'get_budget_details_batch',
+                lambda: _budget_details_batch_payload(request.user, budget_ids), ids_key(budget_ids)
+            ))
+        except json.JSONDecodeError:
+            return JsonResponse({
+                "code": 400,
+                "message": "JSON 数据格式错误",
+                "data": {}
+            })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+def _budget_details_batch_payload(user, budget_ids):
+    rows = BUDGET_SERIALIZER.serialize(Budget.objects.filter(
+        id__in=budget_ids, account__user=user, account__deleting=False))
+    found = {}
+    for row in rows:
+        row["remaining"] = _remaining(row["budgetbalance"], row["spent"])
+        found[row["budgetid"]] = row
+    return {
+        "code": 200,
+        "message": "预算信息获取成功",
+        "data": {
+            "budgets": [found[budget_id] for budget_id in budget_ids if budget_id in found],
+            # 不存在或不属于当前用户的预算 ID
+            "missing": [budget_id for budget_id in budget_ids if budget_id not in found]
+        }
+    }
+
+
+def _remaining(budgetbalance, spent):
+    # 预算剩余额度，直接由维护好的 spent 计数得出，无需汇总交易
+    return str(Decimal(budgetbalance) - Decimal(spent))
@@ -0,0 +1,180 @@
+"""
+交易趋势分析：按 (预算, 交易类型) 计算每个周期的消费额、移动平均与线性预测。
+
+一条 values_list 查询取回日期、预算、类型、金额四列，转换为 NumPy 列数组后，
+分组、按周期装箱、移动平均和最小二乘拟合都以向量化运算完成，不逐行处理 Trade 对象。
+"""
+import datetime
+
+import numpy as np
+from django.db import connections
+from django.db.models import CharField, FloatField
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from .models import Trade
+
+# 支持的周期粒度及其对应的 numpy datetime64 单位
+PERIOD_UNITS = {"day": "D", "month": "M"}
+
+# load_columns 返回的列数组结构与每批从数据库读取的行数
+COLUMN_DTYPE = np.dtype([
+    ('created', 'datetime64[us]'), ('budget_id', np.int64), ('type_code', np.int64), ('amount', np.float64),
+])
+COLUMN_CHUNK_SIZE = 10000
+
+
+def load_columns(trades):
+    """
+    一次查询取回 (日期, 预算, 类型, 金额) 四列，返回 (days, budget_ids, type_codes, type_names, amounts)，
+    days 为 TIME_ZONE 下的日期，type_codes 为 type_names 中的下标。
+
+    逐行构造 datetime 与 Decimal 是取数的主要开销：SQLite/MySQL 中时间以 UTC 文本存储，
+    直接取原始字符串由 NumPy 解析；金额在数据库中转成浮点取回；结果行直接流式写入结构化数组。
+    """
+    vendor = connections[trades.db].vendor
+    created = 'created_at' if vendor == 'postgresql' else Cast('created_at', CharField())
+    rows = trades.annotate(
+        created=created, amount=Cast('tradebalance', FloatField())
+    ).values_list('created', 'budget_id', 'tradetype', 'amount').order_by()
+
+    type_codes = {}
+    if vendor == 'postgresql':
+        utc = datetime.timezone.utc
+        rows = ((value.astimezone(utc).replace(tzinfo=None), budget_id, tradetype, amount)
+                for value, budget_id, tradetype, amount in rows.iterator(chunk_size=COLUMN_CHUNK_SIZE))
+    else:
+        rows = rows.iterator(chunk_size=COLUMN_CHUNK_SIZE)
+    columns = np.fromiter(
+        ((created, budget_id, type_codes.setdefault(tradetype, len(type_codes)), amount)
+         for created, budget_id, tradetype, amount in rows),
+        dtype=COLUMN_DTYPE,
+    )
+    # 类型编码按名称排序，分组输出顺序与首次出现的顺序无关
+    type_names = np.array(list(type_codes), dtype=str)
+    order = np.argsort(type_names)
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    return (local_days(columns['created']), columns['budget_id'], ranks[columns['type_code']],
+            type_names[order], columns['amount'])
+
+
+def local_days(utc):
+    """把 UTC 时间数组换算为 TIME_ZONE 下的日期数组。"""
+    if timezone.get_current_timezone_name() == 'UTC':
+        return utc.astype('datetime64[D]')
+    # 时区偏移只在整刻钟变化：按 15 分钟分桶，每个桶只在 Python 中计算一次偏移
+    tz = timezone.get_current_timezone()
+    buckets, inverse = np.unique(utc.astype('datetime64[m]').astype(np.int64) // 15, return_inverse=True)
+    offsets = np.array([
+        datetime.datetime.fromtimestamp(int(bucket) * 900, tz).utcoffset() // datetime.timedelta(minutes=1)
+        for bucket in buckets
+    ], dtype=np.int64)
+    return (utc.astype('datetime64[m]') + offsets[inverse.reshape(-1)].astype('timedelta64[m]')).astype('datetime64[D]')
+
+
+def period_count(start, end, period):
+    """[start, end] 覆盖的周期数。"""
+    unit = PERIOD_UNITS[period]
+    return int((np.datetime64(end, unit) - np.datetime64(start, unit)).astype(np.int64)) + 1
+
+
+def period_labels(start, count, period):
+    """从 start 所在周期起连续 count 个周期的显示标签。"""
+    unit = PERIOD_UNITS[period]
+    periods = np.datetime64(start, unit) + np.arange(count)
+    return [str(value) for value in periods]
+
+
+def trend(columns, period, start, end, window=3, horizon=3):
+    """
+    按 (预算, 交易类型) 分组计算 [start, end] 范围内每个周期的消费额序列。
+
+    返回 dict：periods 为周期标签，forecast_periods 为预测周期标签，groups 为每组的
+    budget_id、tradetype、totals、moving_average（前 window-1 个周期为 None）、
+    slope（每周期的线性变化量）与 forecast（未来 horizon 个周期的线性预测）。
+    """
+    days, budget_ids, type_codes, type_names, amounts = columns
+    unit = PERIOD_UNITS[period]
+    first = np.datetime64(start, unit)
+    count = period_count(start, end, period)
+    result = {
+        "periods": period_labels(start, count, period),
+        "forecast_periods": [str(value) for value in first + count + np.arange(horizon)],
+        "groups": [],
+    }
+
+    # 只保留时间范围内的行，并换算为周期序号
+    index = (days.astype(f'datetime64[{unit}]') - first).astype(np.int64)
+    mask = (index >= 0) & (index < count)
+    index, budget_ids, type_codes, amounts = index[mask], budget_ids[mask], type_codes[mask], amounts[mask]
+    if not len(index):
+        return result
+
+    # (预算, 类型) 组合编码为连续的分组号，再用 bincount 一次完成分组求和
+    groups, group_index = np.unique(budget_ids * len(type_names) + type_codes, return_inverse=True)
+    group_index = group_index.reshape(-1)
+    totals = np.bincount(group_index * count + index, weights=amounts,
+                         minlength=len(groups) * count).reshape(len(groups), count)
+
+    # 移动平均：累积和相减，每个窗口 O(1)
+    moving = np.full(totals.shape, np.nan)
+    if window <= count:
+        cumulative = np.cumsum(np.pad(totals, ((0, 0), (1, 0))), axis=1)
+        moving[:, window - 1:] = (cumulative[:, window:] - cumulative[:, :-window]) / window
+
+    # 对所有分组同时做最小二乘直线拟合 y = intercept + slope * x
+    x = np.arange(count, dtype=float)
+    x_centered = x - x.mean()
+    denominator = (x_centered ** 2).sum()
+    means = totals.mean(axis=1)
+    slopes = (totals - means[:, None]) @ x_centered / denominator if denominator else np.zeros(len(groups))
+    intercepts = means - slopes * x.mean()
+    forecast = intercepts[:, None] + slopes[:, None] * (count + np.arange(horizon))
+
+    for number, group in enumerate(groups):
+        budget_id, type_code = divmod(int(group), len(type_names))
+        result["groups"].append({
+            "budget_id": budget_id,
+            "tradetype": str(type_names[type_code]),
+            "totals": _money_list(totals[number]),
+            "moving_average": _money_list(moving[number]),
+            "slope": _money(slopes[number]),
+            "forecast": _money_list(forecast[number]),
+        })
+    return result
+
+
+def period_range(start, end, period):
+    """把 [start, end] 日期范围扩展为完整的周期：月粒度从 start 所在月 1 日到 end 所在月最后一天。"""
+    unit = PERIOD_UNITS[period]
+    first = np.datetime64(start, unit).astype('datetime64[D]').astype(datetime.date)
+    last = (np.datetime64(end, unit) + 1).astype('datetime64[D]').astype(datetime.date) - datetime.timedelta(days=1)
+    return first, last
+
+
+def default_start(end, period, count=12):
+    """未指定起始日期时，默认取截至 end 的最近 count 个周期。"""
+    start = np.datetime64(end, PERIOD_UNITS[period]) - (count - 1)
+    return start.astype('datetime64[D]').astype(datetime.date)
+
+
+def user_trades(user, start, end, budget_id=None, tradetype=None):
+    # 日期范围换算为时间范围，走 (account, created_at) 复合索引
+    since = timezone.make_aware(datetime.datetime.combine(start, datetime.time.min))
+    until = timezone.make_aware(datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min))
+    trades = Trade.objects.filter(account__user=user, account__deleting=False,
+                                  created_at__gte=since, created_at__lt=until)
+    if budget_id is not None:
+        trades = trades.filter(budget_id=budget_id)
+    if tradetype is not None:
+        trades = trades.filter(tradetype=tradetype)
+    return trades
+
+
+def _money(value):
+    return None if np.isnan(value) else f'{value:.2f}'
+
+
+def _money_list(values):
+    return [_money(value) for value in values]
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from trade.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = '删除已过期的幂等键记录'
+
+    def handle(self, *args, **options):
+        # expires_at 上有索引，单条 DELETE 即可完成
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'已删除 {deleted} 条过期的幂等键'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from trade.services import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = '根据交易记录全量重建按日/按月的交易汇总表（TradeRollup）'
+
+    def handle(self, *args, **options):
+        created = rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS(f'已重建 {created} 条交易汇总'))
@@ -0,0 +1,37 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_created_at(apps, schema_editor):
+    # 历史交易没有记录时间，统一回填为迁移执行时间
+    Trade = apps.get_model('trade', 'Trade')
+    Trade.objects.filter(created_at__isnull=True).update(created_at=django.utils.timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trade', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trade',
+            name='created_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='trade',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['account', 'created_at'], name='trade_account_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(fields=['budget', 'created_at'], name='trade_budget_created_idx'),
+        ),
+    ]
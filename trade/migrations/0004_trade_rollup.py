@@ -0,0 +1,57 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.conf import settings
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+
+
+def backfill_rollups(apps, schema_editor):
+    Trade = apps.get_model('trade', 'Trade')
+    TradeRollup = apps.get_model('trade', 'TradeRollup')
+    for period, period_start in (('day', TruncDate('created_at')),
+                                 ('month', TruncMonth('created_at', output_field=DateField()))):
+        rows = Trade.objects.annotate(period_start=period_start).values(
+            'account__user_id', 'account_id', 'budget_id', 'tradetype', 'period_start'
+        ).annotate(total=Sum('tradebalance'), trade_count=Count('id')).order_by()
+        TradeRollup.objects.bulk_create([
+            TradeRollup(user_id=row['account__user_id'], account_id=row['account_id'], budget_id=row['budget_id'],
+                        tradetype=row['tradetype'], period=period, period_start=row['period_start'],
+                        total=Decimal(row['total']).quantize(Decimal('0.01')), trade_count=row['trade_count'])
+            for row in rows.iterator()
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0001_initial'),
+        ('budget', '0002_budget_counters'),
+        ('trade', '0003_idempotency_key'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TradeRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tradetype', models.CharField(max_length=50)),
+                ('period', models.CharField(choices=[('day', '日'), ('month', '月')], max_length=10)),
+                ('period_start', models.DateField()),
+                ('total', models.DecimalField(decimal_places=2, default=0.0, max_digits=15)),
+                ('trade_count', models.PositiveIntegerField(default=0)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trade_rollups', to='account.account')),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trade_rollups', to='budget.budget')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trade_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'period', 'period_start'], name='trade_rollup_user_period_idx')],
+                'constraints': [models.UniqueConstraint(fields=('account', 'budget', 'tradetype', 'period', 'period_start'), name='trade_rollup_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
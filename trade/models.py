@@ -1,5 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 
 
 class Trade(models.Model):
@@ -32,6 +34,76 @@ class Trade(models.Model):
     ]
     tradetype = models.CharField(max_length=50, choices=TRADE_TYPE_CHOICES)
 
+    # 交易时间
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        # 按账户/预算查询某段时间内的交易
+        indexes = [
+            models.Index(fields=['account', 'created_at'], name='trade_account_created_idx'),
+            models.Index(fields=['budget', 'created_at'], name='trade_budget_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.tradetype} - {self.tradebalance} - {self.account.accountname}"
 
+
+class IdempotencyKey(models.Model):
+    # 客户端通过 Idempotency-Key 请求头重试写请求时，直接返回首次请求的响应
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='idempotency_keys')
+
+    # 客户端提供的幂等键
+    key = models.CharField(max_length=255)
+
+    # 首次请求体的 SHA-256，用于识别同一个键被用于不同请求
+    request_hash = models.CharField(max_length=64)
+
+    # 首次请求的响应内容
+    response = models.JSONField(encoder=DjangoJSONEncoder)
+
+    created_at = models.DateTimeField(default=timezone.now)
+
+    # 过期时间，过期记录由 purge_idempotency_keys 命令清理
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+class TradeRollup(models.Model):
+    # 按 (用户, 账户, 预算, 交易类型, 周期) 预聚合的交易金额与笔数，报表只读这张表，
+    # 由 trade.services 在记账/删除时增量维护，rebuild_trade_rollups 命令可全量重建
+    PERIOD_CHOICES = [
+        ('day', '日'),
+        ('month', '月'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='trade_rollups')
+    account = models.ForeignKey('account.Account', on_delete=models.CASCADE, related_name='trade_rollups')
+    budget = models.ForeignKey('budget.Budget', on_delete=models.CASCADE, related_name='trade_rollups')
+    tradetype = models.CharField(max_length=50)
+
+    # 周期粒度与周期的起始日期（按 TIME_ZONE 计算，月粒度为当月 1 日）
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateField()
+
+    # 周期内的交易总额与笔数
+    total = models.DecimalField(max_digits=15, decimal_places=2, default=0.00)
+    trade_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['account', 'budget', 'tradetype', 'period', 'period_start'],
+                                    name='trade_rollup_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'period', 'period_start'], name='trade_rollup_user_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.period_start} - {self.tradetype} - {self.total}"
@@ -0,0 +1,240 @@
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from account import ledger
+from account.models import Account, LedgerEntry
+from budget.models import Budget
+from FinanceManageSystem.money import money
+from .models import Trade, TradeRollup
+
+# 消费类交易类型，记账时从账户余额中扣除
+EXPENSE_TYPES = frozenset(choice for choice, _ in Trade.TRADE_TYPE_CHOICES)
+
+# 充值类交易类型，删除并恢复余额时需要从账户中扣回
+DEPOSIT_TYPE = 'Deposit'
+
+# bulk_create 每批插入的行数
+BULK_BATCH_SIZE = 500
+
+
+class InsufficientBalance(Exception):
+    pass
+
+
+def create_trade(account, budget, tradebalance, tradetype, traderemark=''):
+    # 余额校验与扣款合并为一条条件 UPDATE，和交易记录的插入放在同一事务中
+    with transaction.atomic():
+        accounts = Account.objects.filter(id=account.id)
+        if tradetype in EXPENSE_TYPES:
+            updated = accounts.filter(accountbalance__gte=tradebalance).update(
+                accountbalance=F('accountbalance') - tradebalance
+            )
+            if not updated:
+                raise InsufficientBalance(account.id)
+        else:
+            # 增加余额（如充值等）
+            accounts.update(accountbalance=F('accountbalance') + tradebalance)
+
+        _update_budget_counters(budget.id, tradetype, tradebalance, 1)
+
+        trade = Trade.objects.create(
+            account=account,
+            budget=budget,
+            traderemark=traderemark,
+            tradebalance=tradebalance,
+            tradetype=tradetype
+        )
+        _update_rollups(account.user_id, account.id, budget.id, tradetype, timezone.localdate(trade.created_at),
+                        tradebalance, 1)
+        ledger.record(account.id, _balance_delta(tradetype, tradebalance), 'trade', tradetype, trade.id)
+        return trade
+
+
+def remove_trade(trade, restore_balance=False):
+    # 先删除再恢复余额：并发删除同一笔交易时只有真正删除成功的请求会回滚余额
+    with transaction.atomic():
+        deleted, _ = Trade.objects.filter(id=trade.id).delete()
+        if not deleted:
+            return False
+        _update_budget_counters(trade.budget_id, trade.tradetype, trade.tradebalance, -1)
+        _update_rollups(None, trade.account_id, trade.budget_id, trade.tradetype,
+                        timezone.localdate(trade.created_at), -trade.tradebalance, -1)
+
+        if restore_balance:
+            accounts = Account.objects.filter(id=trade.account_id)
+            if trade.tradetype in EXPENSE_TYPES:
+                accounts.update(accountbalance=F('accountbalance') + trade.tradebalance)
+                ledger.record(trade.account_id, trade.tradebalance, 'reversal', trade.tradetype, trade.id)
+            elif trade.tradetype == DEPOSIT_TYPE:
+                accounts.update(accountbalance=F('accountbalance') - trade.tradebalance)
+                ledger.record(trade.account_id, -trade.tradebalance, 'reversal', trade.tradetype, trade.id)
+        return True
+
+
+def _item_error(index, code, message):
+    return {"index": index, "code": code, "message": message}
+
+
+def bulk_create_trades(user, items):
+    """
+    批量记账：两条 IN 查询校验账户/预算归属，在内存中按顺序计算每个账户的余额变化，
+    再在同一事务中为每个涉及的账户执行一次条件 UPDATE 并 bulk_create 所有交易。
+
+    返回 (created, errors)，created 为 [(index, trade)]，errors 为逐条的错误信息。
+    """
+    errors = []
+    parsed = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append(_item_error(index, 400, "交易记录格式错误"))
+            continue
+        account_id = item.get('account_id')
+        budget_id = item.get('budget_id')
+        tradebalance = item.get('tradebalance')
+        tradetype = item.get('tradetype')
+        if not all([account_id, budget_id, tradebalance, tradetype]):
+            errors.append(_item_error(index, 400, "缺少必要参数"))
+            continue
+        try:
+            account_id = int(account_id)
+            budget_id = int(budget_id)
+            tradebalance = Decimal(str(tradebalance))
+        except (TypeError, ValueError, InvalidOperation):
+            errors.append(_item_error(index, 400, "无效的参数"))
+            continue
+        if not tradebalance.is_finite():
+            errors.append(_item_error(index, 400, "无效的参数"))
+            continue
+        parsed.append((index, account_id, budget_id, tradebalance, tradetype, item.get('traderemark', '')))
+
+    # 两条 IN 查询完成全部归属校验，同时取回账户当前余额
+    balances = dict(Account.objects.filter(
+        user=user, deleting=False, id__in={row[1] for row in parsed}
+    ).values_list('id', 'accountbalance'))
+    budget_ids = set(Budget.objects.filter(
+        account__user=user, account__deleting=False, id__in={row[2] for row in parsed}
+    ).values_list('id', flat=True))
+
+    # 在内存中按提交顺序模拟余额变化，汇总每个账户的净变化和每个预算的计数变化
+    deltas = defaultdict(Decimal)
+    budget_spent = defaultdict(Decimal)
+    budget_counts = defaultdict(int)
+    # (账户, 预算, 交易类型, 交易日期) -> [金额, 笔数]
+    rollups = defaultdict(lambda: [Decimal(0), 0])
+    pending = []
+    for index, account_id, budget_id, tradebalance, tradetype, traderemark in parsed:
+        if account_id not in balances:
+            errors.append(_item_error(index, 403, "不是当前用户的账户"))
+            continue
+        if budget_id not in budget_ids:
+            errors.append(_item_error(index, 403, "不是当前用户的预算"))
+            continue
+        delta = _balance_delta(tradetype, tradebalance)
+        if delta < 0 and balances[account_id] + delta < 0:
+            errors.append(_item_error(index, 400, "账户余额不足"))
+            continue
+        balances[account_id] += delta
+        deltas[account_id] += delta
+        budget_counts[budget_id] += 1
+        if tradetype in EXPENSE_TYPES:
+            budget_spent[budget_id] += tradebalance
+        trade = Trade(
+            account_id=account_id,
+            budget_id=budget_id,
+            traderemark=traderemark,
+            tradebalance=tradebalance,
+            tradetype=tradetype
+        )
+        rollup = rollups[(account_id, budget_id, tradetype, timezone.localdate(trade.created_at))]
+        rollup[0] += tradebalance
+        rollup[1] += 1
+        pending.append((index, trade))
+
+    errors.sort(key=lambda error: error["index"])
+    if not pending:
+        return [], errors
+
+    with transaction.atomic():
+        for account_id, delta in deltas.items():
+            accounts = Account.objects.filter(id=account_id)
+            if delta < 0:
+                # 余额在校验后被并发修改导致不足时，整批回滚
+                if not accounts.filter(accountbalance__gte=-delta).update(accountbalance=F('accountbalance') + delta):
+                    raise InsufficientBalance(account_id)
+            elif delta > 0:
+                accounts.update(accountbalance=F('accountbalance') + delta)
+        for budget_id, count in budget_counts.items():
+            Budget.objects.filter(id=budget_id).update(
+                spent=F('spent') + budget_spent[budget_id],
+                trade_count=F('trade_count') + count
+            )
+        Trade.objects.bulk_create([trade for _, trade in pending], batch_size=BULK_BATCH_SIZE)
+        ledger.record_many([
+            LedgerEntry(account_id=trade.account_id, amount=_balance_delta(trade.tradetype, trade.tradebalance),
+                        entry_type='trade', counterparty=trade.tradetype, trade_id=trade.id)
+            for _, trade in pending
+        ])
+        for (account_id, budget_id, tradetype, day), (total, count) in rollups.items():
+            _update_rollups(user.id, account_id, budget_id, tradetype, day, total, count)
+
+    return pending, errors
+
+
+def _balance_delta(tradetype, tradebalance):
+    # 记账对账户余额的影响：消费类扣减，其余增加
+    return -tradebalance if tradetype in EXPENSE_TYPES else tradebalance
+
+
+def _update_budget_counters(budget_id, tradetype, tradebalance, sign):
+    # 增量维护预算的已消费金额与交易笔数，sign 为 1 表示记账，-1 表示删除
+    updates = {"trade_count": F('trade_count') + sign}
+    if tradetype in EXPENSE_TYPES:
+        updates["spent"] = F('spent') + sign * tradebalance
+    Budget.objects.filter(id=budget_id).update(**updates)
+
+
+def _update_rollups(user_id, account_id, budget_id, tradetype, day, total, count):
+    # 增量维护日/月汇总，day 为交易时间在 TIME_ZONE 下的日期，count 为负表示删除交易；
+    # 行不存在时插入，并发插入冲突时改为更新
+    for period, period_start in (("day", day), ("month", day.replace(day=1))):
+        rollups = TradeRollup.objects.filter(account_id=account_id, budget_id=budget_id, tradetype=tradetype,
+                                             period=period, period_start=period_start)
+        updates = {"total": F('total') + total, "trade_count": F('trade_count') + count}
+        if rollups.update(**updates) or count < 0:
+            continue
+        try:
+            with transaction.atomic():
+                TradeRollup.objects.create(user_id=user_id, account_id=account_id, budget_id=budget_id,
+                                           tradetype=tradetype, period=period, period_start=period_start,
+                                           total=total, trade_count=count)
+        except IntegrityError:
+            rollups.update(**updates)
+
+
+def rebuild_rollups():
+    """根据交易记录全量重建日/月汇总，返回写入的汇总行数。"""
+    periods = {
+        "day": TruncDate('created_at'),
+        "month": TruncMonth('created_at', output_field=DateField()),
+    }
+    with transaction.atomic():
+        TradeRollup.objects.all().delete()
+        created = 0
+        for period, period_start in periods.items():
+            rows = Trade.objects.annotate(period_start=period_start).values(
+                'account__user_id', 'account_id', 'budget_id', 'tradetype', 'period_start'
+            ).annotate(total=Sum('tradebalance'), trade_count=Count('id')).order_by()
+            created += len(TradeRollup.objects.bulk_create([
+                TradeRollup(user_id=row['account__user_id'], account_id=row['account_id'],
+                            budget_id=row['budget_id'], tradetype=row['tradetype'], period=period,
+                            period_start=row['period_start'],
+                            total=money(row['total']),
+                            trade_count=row['trade_count'])
+                for row in rows.iterator()
+            ], batch_size=BULK_BATCH_SIZE))
+    return created
@@ -1,3 +1,472 @@
-from django.test import TestCase
+import csv
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from FinanceManageSystem.testing import local_api_cache, local_auth_cache
+from account.models import Account
+from budget.models import Budget
+from .models import IdempotencyKey, Trade, TradeRollup
+from .services import InsufficientBalance, bulk_create_trades, create_trade, remove_trade
+
+User = get_user_model()
+
+
+class GetTradesPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='alice', password='pw')
+        cls.account = Account.objects.create(user=cls.user, accountname='工资卡', accounttype='bank',
+                                             accountbalance=Decimal('1000.00'))
+        cls.budget = Budget.objects.create(account=cls.account, budgetname='吃饭', budgettype='Dining',
+                                           budgetbalance=Decimal('500.00'))
+        Trade.objects.bulk_create([
+            Trade(account=cls.account, budget=cls.budget, tradebalance=Decimal(i), tradetype='Dining')
+            for i in range(1, 6)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cursor_walks_all_pages(self):
+        seen = []
+        cursor = None
+        while True:
+            params = {'limit': 2}
+            if cursor:
+                params['cursor'] = cursor
+            body = self.client.get('/trade/get_trades/', params).json()
+            self.assertEqual(body['code'], 200)
+            seen.extend(item['id'] for item in body['data'])
+            cursor = body['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(Trade.objects.order_by('id').values_list('id', flat=True)))
+
+    def test_fields_projection(self):
+        body = self.client.get('/trade/get_trades/', {'fields': 'tradebalance,budget_name'}).json()
+        self.assertEqual(body['data'][0], {'tradebalance': '1.00', 'budget_name': '吃饭'})
+
+    def test_invalid_cursor_and_field(self):
+        self.assertEqual(self.client.get('/trade/get_trades/', {'cursor': '!!'}).json()['code'], 400)
+        self.assertEqual(self.client.get('/trade/get_trades/', {'fields': 'password'}).json()['code'], 400)
+
+
+class GetTradesQueryCountTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='bob', password='pw')
+        self.client.force_login(self.user)
+
+    def _add_trades(self, count):
+        account = Account.objects.create(user=self.user, accountname='钱包', accounttype='wallet')
+        budget = Budget.objects.create(account=account, budgetname='交通', budgettype='Transportation')
+        Trade.objects.bulk_create([
+            Trade(account=account, budget=budget, tradebalance=Decimal('1.00'), tradetype='Transportation')
+            for _ in range(count)
+        ])
+
+    def _count_queries(self):
+        # 每次都从冷缓存开始，会话与用户查询在两次测量中保持一致
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/trade/get_trades/').json()
+        self.assertEqual(body['code'], 200)
+        return len(ctx)
+
+    def test_query_count_independent_of_rows(self):
+        self._add_trades(1)
+        baseline = self._count_queries()
+        self._add_trades(20)
+        self.assertEqual(self._count_queries(), baseline)
+
+
+class ExportTradesTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='carol', password='pw')
+        account = Account.objects.create(user=cls.user, accountname='支付宝', accounttype='ali')
+        budget = Budget.objects.create(account=account, budgetname='购物', budgettype='Shopping')
+        Trade.objects.bulk_create([
+            Trade(account=account, budget=budget, tradebalance=Decimal('2.50'), tradetype='Shopping',
+                  traderemark=f'第{i}笔')
+            for i in range(3)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_ndjson_export_streams_every_trade(self):
+        response = self.client.get('/trade/export_trades/')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[0])['traderemark'], '第0笔')
+
+    def test_csv_export_has_header(self):
+        response = self.client.get('/trade/export_trades/', {'format': 'csv'})
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0][0], 'id')
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][4], '2.50')
+
+
+class ConcurrentBalanceTests(TransactionTestCase):
+    WORKERS = 8
+    TRADES_PER_WORKER = 10
+
+    def test_parallel_debits_do_not_lose_updates(self):
+        user = User.objects.create_user(username='dave', password='pw')
+        account = Account.objects.create(user=user, accountname='工资卡', accounttype='bank',
+                                         accountbalance=Decimal('50.00'))
+        budget = Budget.objects.create(account=account, budgetname='吃饭', budgettype='Dining')
+        results = []
+
+        def worker():
+            try:
+                for _ in range(self.TRADES_PER_WORKER):
+                    # 测试库为共享缓存的内存 SQLite，表锁冲突会立即报错，此时整笔事务已回滚，重试即可
+                    while True:
+                        try:
+                            create_trade(account, budget, Decimal('1.00'), 'Dining')
+                            results.append(True)
+                        except InsufficientBalance:
+                            results.append(False)
+                        except OperationalError:
+                            time.sleep(0.001)
+                            continue
+                        break
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.WORKERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # 80 笔扣款只有 50 笔能成功，余额恰好扣完且与交易记录一致
+        account.refresh_from_db()
+        self.assertEqual(results.count(True), 50)
+        self.assertEqual(account.accountbalance, Decimal('0.00'))
+        self.assertEqual(Trade.objects.filter(account=account).count(), 50)
+
+
+class BulkAddTradesTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='erin', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('10.00'))
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+        other = User.objects.create_user(username='frank', password='pw')
+        self.other_account = Account.objects.create(user=other, accountname='别人的卡', accounttype='bank')
+        self.client.force_login(self.user)
+
+    def _post(self, trades):
+        return self.client.post('/trade/bulk_add_trades/', json.dumps({'trades': trades}),
+                                content_type='application/json').json()
+
+    def test_applies_net_balance_and_reports_item_errors(self):
+        trade = {'account_id': self.account.id, 'budget_id': self.budget.id, 'tradetype': 'Dining'}
+        body = self._post([
+            dict(trade, tradebalance='4.00'),
+            dict(trade, tradebalance='7.00'),                  # 余额不足
+            dict(trade, tradebalance='5.00', tradetype='Deposit'),
+            dict(trade, tradebalance='8.00'),
+            dict(trade, tradebalance='1.00', account_id=self.other_account.id),
+            {'account_id': self.account.id},
+        ])
+        self.assertEqual(body['code'], 200)
+        self.assertEqual([item['index'] for item in body['data']['created']], [0, 2, 3])
+        self.assertEqual([(error['index'], error['code']) for error in body['data']['errors']],
+                         [(1, 400), (4, 403), (5, 400)])
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.accountbalance, Decimal('3.00'))
+        self.assertEqual(Trade.objects.filter(account=self.account).count(), 3)
+
+    def test_ownership_checked_with_fixed_queries(self):
+        trade = {'account_id': self.account.id, 'budget_id': self.budget.id, 'tradetype': 'Deposit',
+                 'tradebalance': '1.00'}
+        # 当天的汇总行已存在时才是稳态，先写入一条
+        self._post([trade])
+        cache.clear()
+        with CaptureQueriesContext(connection) as small:
+            self._post([trade])
+        cache.clear()
+        with CaptureQueriesContext(connection) as large:
+            self._post([trade] * 50)
+        self.assertEqual(len(small), len(large))
+
+
+@local_auth_cache
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='gina', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('100.00'))
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+        self.client.force_login(self.user)
+        self.body = json.dumps({'account_id': self.account.id, 'budget_id': self.budget.id,
+                                'tradebalance': '30.00', 'tradetype': 'Dining'})
+
+    def _post(self, body=None, key='retry-1'):
+        return self.client.post('/trade/add_trade/', body or self.body, content_type='application/json',
+                                headers={'Idempotency-Key': key})
+
+    def test_retry_replays_first_response_without_debiting_again(self):
+        first = self._post()
+        self.assertEqual(first.json()['code'], 200)
+        # 会话与用户均命中缓存，重放只有一次幂等键点查
+        with self.assertNumQueries(1):
+            replay = self._post()
+        self.assertEqual(replay.json(), first.json())
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.accountbalance, Decimal('70.00'))
+        self.assertEqual(Trade.objects.filter(account=self.account).count(), 1)
+
+        # 不同的键按新请求处理
+        self.assertEqual(self._post(key='retry-2').json()['code'], 200)
+        self.assertEqual(Trade.objects.filter(account=self.account).count(), 2)
+
+    def test_key_reused_for_different_request_is_rejected(self):
+        self._post()
+        other = json.dumps({'account_id': self.account.id, 'budget_id': self.budget.id,
+                            'tradebalance': '1.00', 'tradetype': 'Dining'})
+        self.assertEqual(self._post(other).json()['code'], 422)
+        self.assertEqual(self._post(key='x' * 256).json()['code'], 400)
+
+    def test_expired_keys_are_reusable_and_purged(self):
+        self._post()
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertNotIn('Idempotent-Replayed', self._post())
+        self.assertEqual(Trade.objects.filter(account=self.account).count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        call_command('purge_idempotency_keys', stdout=StringIO())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@local_auth_cache
+class TradeRollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='hana', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('1000.00'))
+        self.dining = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+        self.travel = Budget.objects.create(account=self.account, budgetname='出行', budgettype='Transportation')
+        self.client.force_login(self.user)
+
+    def _rollups(self):
+        return sorted(TradeRollup.objects.filter(trade_count__gt=0).values_list(
+            'user_id', 'account_id', 'budget_id', 'tradetype', 'period', 'period_start', 'total', 'trade_count'))
+
+    def test_incremental_updates_match_full_rebuild(self):
+        create_trade(self.account, self.dining, Decimal('10.50'), 'Dining')
+        trade = create_trade(self.account, self.dining, Decimal('4.00'), 'Dining')
+        create_trade(self.account, self.travel, Decimal('3.25'), 'Transportation')
+        bulk_create_trades(self.user, [
+            {'account_id': self.account.id, 'budget_id': self.dining.id, 'tradebalance': '1.10', 'tradetype': 'Dining'},
+            {'account_id': self.account.id, 'budget_id': self.dining.id, 'tradebalance': '2.20', 'tradetype': 'Dining'},
+        ])
+        remove_trade(trade)
+
+        incremental = self._rollups()
+        dining_month = [row for row in incremental if row[3] == 'Dining' and row[4] == 'month']
+        self.assertEqual([(row[6], row[7]) for row in dining_month], [(Decimal('13.80'), 3)])
+
+        call_command('rebuild_trade_rollups', stdout=StringIO())
+        self.assertEqual(self._rollups(), incremental)
+
+    def test_report_reads_only_rollups(self):
+        Trade.objects.bulk_create([
+            Trade(account=self.account, budget=self.dining, tradebalance=Decimal('10.00'), tradetype='Dining',
+                  created_at=datetime(2024, 1, 5, tzinfo=dt_timezone.utc)),
+            Trade(account=self.account, budget=self.dining, tradebalance=Decimal('5.00'), tradetype='Dining',
+                  created_at=datetime(2024, 1, 20, tzinfo=dt_timezone.utc)),
+            Trade(account=self.account, budget=self.travel, tradebalance=Decimal('3.00'), tradetype='Transportation',
+                  created_at=datetime(2024, 2, 1, tzinfo=dt_timezone.utc)),
+            Trade(account=self.account, budget=self.travel, tradebalance=Decimal('7.00'), tradetype='Transportation',
+                  created_at=datetime(2023, 12, 31, tzinfo=dt_timezone.utc)),
+        ])
+        call_command('rebuild_trade_rollups', stdout=StringIO())
+
+        self.client.get('/trade/spending_report/')
+        with CaptureQueriesContext(connection) as queries:
+            body = self.client.get('/trade/spending_report/?since=2024-01-01').json()
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"trade_trade"', queries[0]['sql'])
+        self.assertEqual(body['data'], [
+            {'period': '2024-01', 'tradetype': 'Dining', 'total': '15.00', 'count': 2},
+            {'period': '2024-02', 'tradetype': 'Transportation', 'total': '3.00', 'count': 1},
+        ])
+
+        body = self.client.get('/trade/spending_report/?period=day&group_by=budget&until=2024-01-06').json()
+        self.assertEqual([(row['period'], row['budget_name'], row['total']) for row in body['data']],
+                         [('2023-12-31', '出行', '7.00'), ('2024-01-05', '吃饭', '10.00')])
+        self.assertEqual(self.client.get('/trade/spending_report/?period=week').json()['code'], 400)
+        # 格式正确但不存在的日期
+        self.assertEqual(self.client.get('/trade/spending_report/?since=2024-13-01').json()['code'], 400)
+
+
+@local_auth_cache
+class SpendingTrendTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='ivan', password='pw')
+        account = Account.objects.create(user=cls.user, accountname='工资卡', accounttype='bank')
+        cls.dining = Budget.objects.create(account=account, budgetname='吃饭', budgettype='Dining')
+        travel = Budget.objects.create(account=account, budgetname='出行', budgettype='Transportation')
+
+        def trade(budget, amount, tradetype, month, day=10, hour=0):
+            return Trade(account=account, budget=budget, tradebalance=Decimal(amount), tradetype=tradetype,
+                         created_at=datetime(2024, month, day, hour, tzinfo=dt_timezone.utc))
+
+        # 吃饭每月 10、20、30……线性增长，出行只有 2 月一笔
+        Trade.objects.bulk_create([
+            trade(cls.dining, '4.00', 'Dining', 1), trade(cls.dining, '6.00', 'Dining', 1, 25, 20),
+            trade(cls.dining, '20.00', 'Dining', 2), trade(cls.dining, '30.00', 'Dining', 3),
+            trade(cls.dining, '40.00', 'Dining', 4), trade(travel, '7.50', 'Transportation', 2),
+            trade(cls.dining, '99.00', 'Dining', 5),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_monthly_trend_moving_average_and_forecast(self):
+        url = '/trade/spending_trend/?since=2024-01-15&until=2024-04-01&window=2&horizon=2'
+        self.client.get(url)
+        with self.assertNumQueries(2):
+            body = self.client.get(url).json()
+        data = body['data']
+        self.assertEqual(data['periods'], ['2024-01', '2024-02', '2024-03', '2024-04'])
+        self.assertEqual(data['forecast_periods'], ['2024-05', '2024-06'])
+        dining, travel = data['groups']
+        self.assertEqual(dining['budget_name'], '吃饭')
+        self.assertEqual(dining['totals'], ['10.00', '20.00', '30.00', '40.00'])
+        self.assertEqual(dining['moving_average'], [None, '15.00', '25.00', '35.00'])
+        self.assertEqual(dining['slope'], '10.00')
+        self.assertEqual(dining['forecast'], ['50.00', '60.00'])
+        self.assertEqual((travel['tradetype'], travel['totals']), ('Transportation', ['0.00', '7.50', '0.00', '0.00']))
+
+    def test_filters_and_invalid_parameters(self):
+        body = self.client.get(f'/trade/spending_trend/?period=day&since=2024-02-10&until=2024-02-10'
+                               f'&budget_id={self.dining.id}').json()
+        self.assertEqual([group['totals'] for group in body['data']['groups']], [['20.00']])
+        for query in ('period=week', 'window=0', 'since=2024-05-01&until=2024-01-01', 'since=2024-02-30',
+                      'period=day&since=2000-01-01&until=2024-01-01'):
+            self.assertEqual(self.client.get(f'/trade/spending_trend/?{query}').json()['code'], 400, query)
+
+    @override_settings(TIME_ZONE='Asia/Shanghai')
+    def test_periods_follow_time_zone(self):
+        # 1 月 25 日 20:00 UTC 在东八区已是 1 月 26 日
+        body = self.client.get(f'/trade/spending_trend/?period=day&since=2024-01-25&until=2024-01-26'
+                               f'&budget_id={self.dining.id}').json()
+        self.assertEqual(body['data']['groups'][0]['totals'], ['0.00', '6.00'])
+
+
+@local_auth_cache
+class TradeSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='grace', password='pw')
+        account = Account.objects.create(user=cls.user, accountname='工资卡', accounttype='bank')
+        dining = Budget.objects.create(account=account, budgetname='吃饭', budgettype='Dining')
+        travel = Budget.objects.create(account=account, budgetname='出行', budgettype='Transportation')
+        Trade.objects.bulk_create([
+            Trade(account=account, budget=dining, tradebalance=Decimal('10.00'), tradetype='Dining'),
+            Trade(account=account, budget=dining, tradebalance=Decimal('5.00'), tradetype='Dining'),
+            Trade(account=account, budget=travel, tradebalance=Decimal('3.00'), tradetype='Transportation'),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_group_by_tradetype_in_one_query(self):
+        # 先预热会话与用户缓存，只统计接口本身的查询
+        self.client.get('/trade/trade_summary/')
+        with CaptureQueriesContext(connection) as ctx:
+            body = self.client.get('/trade/trade_summary/', {'group_by': 'tradetype'}).json()
+        self.assertEqual(body['data'], [
+            {'tradetype': 'Dining', 'total': '15.00', 'count': 2, 'average': '7.50'},
+            {'tradetype': 'Transportation', 'total': '3.00', 'count': 1, 'average': '3.00'},
+        ])
+        self.assertEqual(len(ctx), 1)
+
+    def test_overall_totals_and_invalid_group(self):
+        body = self.client.get('/trade/trade_summary/').json()
+        self.assertEqual(body['data'], [{'total': '18.00', 'count': 3, 'average': '6.00'}])
+        self.assertEqual(self.client.get('/trade/trade_summary/', {'group_by': 'user'}).json()['code'], 400)
+
+
+class TradeTimeRangeTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='heidi', password='pw')
+        cls.account = Account.objects.create(user=cls.user, accountname='工资卡', accounttype='bank')
+        budget = Budget.objects.create(account=cls.account, budgetname='吃饭', budgettype='Dining')
+        Trade.objects.bulk_create([
+            Trade(account=cls.account, budget=budget, tradebalance=Decimal('1.00'), tradetype='Dining',
+                  created_at=datetime(2024, month, 15, tzinfo=dt_timezone.utc))
+            for month in (1, 2, 3)
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_since_until_filter_get_trades_and_summary(self):
+        params = {'since': '2024-02-01', 'until': '2024-03-01'}
+        body = self.client.get('/trade/get_trades/', params).json()
+        self.assertEqual([item['created_at'][:10] for item in body['data']], ['2024-02-15'])
+        body = self.client.get('/trade/trade_summary/', params).json()
+        self.assertEqual(body['data'][0]['count'], 1)
+        self.assertEqual(self.client.get('/trade/get_trades/', {'since': '2024-13-01'}).json()['code'], 400)
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN 输出格式依赖 SQLite')
+    def test_time_range_query_uses_composite_index(self):
+        since = datetime(2024, 2, 1, tzinfo=dt_timezone.utc)
+        plan = Trade.objects.filter(account__user=self.user, created_at__gte=since).order_by('id').explain()
+        self.assertIn('trade_account_created_idx', plan)
+        budget = Budget.objects.get(account=self.account)
+        plan = Trade.objects.filter(budget=budget, created_at__gte=since).explain()
+        self.assertIn('trade_budget_created_idx', plan)
+
+
+@local_api_cache
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='ivan', password='pw')
+        self.account = Account.objects.create(user=self.user, accountname='工资卡', accounttype='bank',
+                                              accountbalance=Decimal('10.00'))
+        self.budget = Budget.objects.create(account=self.account, budgetname='吃饭', budgettype='Dining')
+        self.client.force_login(self.user)
+
+    def test_unchanged_listings_return_304(self):
+        for url in ('/trade/get_trades/', '/account/get_user_accounts/', '/budget/get_user_budgets/'):
+            etag = self.client.get(url)['ETag']
+            response = self.client.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304, url)
+            self.assertEqual(response.content, b'')
+
+    def test_write_and_query_string_change_etag(self):
+        etag = self.client.get('/trade/get_trades/')['ETag']
+        self.assertNotEqual(self.client.get('/trade/get_trades/', {'limit': 1})['ETag'], etag)
+        self.client.post('/trade/add_trade/', json.dumps({
+            'account_id': self.account.id, 'budget_id': self.budget.id,
+            'tradebalance': '1.00', 'tradetype': 'Dining'
+        }), content_type='application/json')
+        response = self.client.get('/trade/get_trades/', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['data']), 1)
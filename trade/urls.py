@@ -3,6 +3,12 @@ from . import views
 
 urlpatterns = [
     path('add_trade/', views.add_trade, name='add_trade'),
+    path('bulk_add_trades/', views.bulk_add_trades, name='bulk_add_trades'),
     path('delete_trade/', views.delete_trade, name='delete_trade'),
     path('get_trades/', views.get_trades, name='get_trades'),
+    path('get_trades_async/', views.get_trades_async, name='get_trades_async'),
+    path('export_trades/', views.export_trades, name='export_trades'),
+    path('trade_summary/', views.trade_summary, name='trade_summary'),
+    path('spending_report/', views.spending_report, name='spending_report'),
+    path('spending_trend/', views.spending_trend, name='spending_trend'),
 ]
@@ -1,17 +1,84 @@
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition
 from django.contrib.auth.decorators import login_required
-from .models import Trade
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Avg, Count, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import IdempotencyKey, Trade, TradeRollup
+from . import analytics
+from .services import InsufficientBalance, bulk_create_trades, create_trade, remove_trade
 from account.models import *
 from budget.models import *
+from FinanceManageSystem import cache
+from FinanceManageSystem.money import money
+from FinanceManageSystem.serializers import RowSerializer
+import base64
+import csv
+import datetime
+import hashlib
 import json
 from decimal import Decimal
 
+# get_trades 每页默认条数与上限
+TRADE_PAGE_SIZE = 50
+TRADE_PAGE_SIZE_MAX = 200
+
+# Idempotency-Key 请求头的最大长度
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+# 单次批量记账允许的最大条数
+BULK_TRADE_LIMIT = 5000
+
+# 导出交易记录时每批从数据库读取的行数
+EXPORT_CHUNK_SIZE = 2000
+
+# trade_summary 支持的分组维度及其对应的 ORM 列
+SUMMARY_GROUPS = {
+    "tradetype": {"tradetype": "tradetype"},
+    "budget": {"budget_id": "budget_id", "budget_name": "budget__budgetname"},
+    "account": {"account_id": "account_id", "account_name": "account__accountname"},
+}
+
+# spending_report 支持的周期粒度，值为周期的显示格式
+REPORT_PERIODS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+# spending_trend 单次最多计算的周期数与预测周期数
+TREND_PERIODS_MAX = 1000
+TREND_HORIZON_MAX = 24
+
+# 交易记录序列化：可投影的字段及其对应的 ORM 列
+TRADE_SERIALIZER = RowSerializer({
+    "id": "id",
+    "account_name": "account__accountname",
+    "budget_name": "budget__budgetname",
+    "tradetype": "tradetype",
+    "tradebalance": "tradebalance",
+    "traderemark": "traderemark",
+    "created_at": "created_at",
+}, decimal_fields=["tradebalance"], datetime_fields=["created_at"])
+
 
 @csrf_exempt
 @login_required
 def add_trade(request):
     if request.method == 'POST':
+        # 带 Idempotency-Key 的重试请求直接返回首次请求的响应，不解析请求体，也不访问账户和交易表
+        idempotency_key = request.headers.get('Idempotency-Key')
+        if idempotency_key is not None:
+            if not 0 < len(idempotency_key) <= IDEMPOTENCY_KEY_MAX_LENGTH:
+                return JsonResponse({
+                    "code": 400,
+                    "message": "无效的 Idempotency-Key",
+                    "data": {}
+                })
+            request_hash = hashlib.sha256(request.body).hexdigest()
+            replay = _replay_idempotent(request.user, idempotency_key, request_hash)
+            if replay is not None:
+                return replay
+
         try:
             # 获取请求中的 JSON 数据
             data = json.loads(request.body)
@@ -36,7 +103,7 @@ def add_trade(request):
 
             # 获取账户对象并确保是当前用户的账户
             try:
-                account = Account.objects.get(id=account_id, user=request.user)
+                account = Account.objects.get(id=account_id, user=request.user, deleting=False)
             except Account.DoesNotExist:
                 return JsonResponse({
                     "code": 403,
@@ -46,7 +113,7 @@ def add_trade(request):
 
             # 获取预算对象并确保是当前用户的预算
             try:
-                budget = Budget.objects.get(id=budget_id, account__user=request.user)
+                budget = Budget.objects.get(id=budget_id, account__user=request.user, account__deleting=False)
             except Budget.DoesNotExist:
                 return JsonResponse({
                     "code": 403,
@@ -54,42 +121,120 @@ def add_trade(request):
                     "data": {}
                 })
 
-            # 检查账户余额是否足够
-            if tradetype in ['Dining', 'Transportation', 'Shopping', 'Entertainment', 'Education', 'Health', 'Housing',
-                             'Communication', 'Personal Care', 'Insurance', 'Investments', 'Gifts']:
-                if tradebalance > account.accountbalance:
-                    return JsonResponse({
-                        "code": 400,
-                        "message": "账户余额不足",
-                        "data": {}
-                    })
-                # 扣除余额
-                account.accountbalance -= tradebalance
-            else:
-                # 增加余额（如充值等）
-                account.accountbalance += tradebalance
-
-            # 保存账户余额的更改
-            account.save()
-
-            # 创建交易记录
-            trade = Trade.objects.create(
-                account=account,
-                budget=budget,
-                traderemark=traderemark,
-                tradebalance=tradebalance,
-                tradetype=tradetype
-            )
+            # 检查余额并扣款/充值，与交易记录的创建在同一事务中原子完成；
+            # 幂等键与交易在同一事务中写入，并发的同键请求只有一个能提交
+            try:
+                with transaction.atomic():
+                    trade = create_trade(account, budget, tradebalance, tradetype, traderemark)
+                    response_data = {
+                        "code": 200,
+                        "message": "交易记录添加成功",
+                        "data": {
+                            "trade_id": trade.id,
+                            "account_name": account.accountname,
+                            "budget_name": budget.budgetname,
+                            "tradebalance": trade.tradebalance,
+                            "tradetype": trade.tradetype
+                        }
+                    }
+                    if idempotency_key is not None:
+                        IdempotencyKey.objects.create(
+                            user=request.user,
+                            key=idempotency_key,
+                            request_hash=request_hash,
+                            response=response_data,
+                            expires_at=timezone.now() + datetime.timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+                        )
+            except InsufficientBalance:
+                return JsonResponse({
+                    "code": 400,
+                    "message": "账户余额不足",
+                    "data": {}
+                })
+            except IntegrityError:
+                # 同键的并发请求已先提交，本次记账已回滚，返回先提交请求的响应
+                replay = _replay_idempotent(request.user, idempotency_key, request_hash) if idempotency_key else None
+                if replay is None:
+                    raise
+                return replay
+            cache.bump_version(request.user.id)
+
+            return JsonResponse(response_data)
+
+        except json.JSONDecodeError:
+            return JsonResponse({
+                "code": 400,
+                "message": "JSON 数据格式错误",
+                "data": {}
+            })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 POST 请求",
+            "data": {}
+        })
+
+
+def _replay_idempotent(user, key, request_hash):
+    """按 (用户, 幂等键) 做一次索引点查，命中且未过期时返回首次请求的响应。"""
+    try:
+        stored_hash, response, expires_at = IdempotencyKey.objects.values_list(
+            'request_hash', 'response', 'expires_at'
+        ).get(user=user, key=key)
+    except IdempotencyKey.DoesNotExist:
+        return None
+    if expires_at <= timezone.now():
+        # 过期的键视为未使用，删除后按新请求处理
+        IdempotencyKey.objects.filter(user=user, key=key, expires_at=expires_at).delete()
+        return None
+    if stored_hash != request_hash:
+        return JsonResponse({
+            "code": 422,
+            "message": "Idempotency-Key 已用于其他请求",
+            "data": {}
+        })
+    replay = JsonResponse(response)
+    replay.headers['Idempotent-Replayed'] = 'true'
+    return replay
+
+
+@csrf_exempt
+@login_required
+def bulk_add_trades(request):
+    if request.method == 'POST':
+        try:
+            data = json.loads(request.body)
+            items = data.get('trades')
+            if not isinstance(items, list) or not items:
+                return JsonResponse({
+                    "code": 400,
+                    "message": "缺少交易记录列表",
+                    "data": {}
+                })
+            if len(items) > BULK_TRADE_LIMIT:
+                return JsonResponse({
+                    "code": 400,
+                    "message": f"单次最多提交 {BULK_TRADE_LIMIT} 条交易记录",
+                    "data": {}
+                })
+
+            try:
+                created, errors = bulk_create_trades(request.user, items)
+            except InsufficientBalance:
+                return JsonResponse({
+                    "code": 409,
+                    "message": "账户余额已变化，请重新提交",
+                    "data": {}
+                })
+            if created:
+                cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
-                "message": "交易记录添加成功",
+                "message": "批量交易记录处理完成",
                 "data": {
-                    "trade_id": trade.id,
-                    "account_name": account.accountname,
-                    "budget_name": budget.budgetname,
-                    "tradebalance": trade.tradebalance,
-                    "tradetype": trade.tradetype
+                    "created": [{"index": index, "trade_id": trade.id} for index, trade in created],
+                    "errors": errors
                 }
             })
 
@@ -128,7 +273,8 @@ def delete_trade(request):
 
             # 获取交易记录对象
             try:
-                trade = Trade.objects.get(id=trade_id, account__user=request.user)
+                trade = Trade.objects.select_related('account').get(
+                    id=trade_id, account__user=request.user, account__deleting=False)
             except Trade.DoesNotExist:
                 return JsonResponse({
                     "code": 404,
@@ -136,35 +282,21 @@ def delete_trade(request):
                     "data": {}
                 })
 
-            # 获取账户对象
-            account = trade.account
-
-            # 如果需要恢复余额
-            if restore_balance:
-                if trade.tradetype in ['Dining', 'Transportation', 'Shopping', 'Entertainment', 'Education', 'Health',
-                                       'Housing', 'Communication', 'Personal Care', 'Insurance', 'Investments',
-                                       'Gifts']:
-                    # 恢复账户余额：从账户中扣除该交易金额
-                    account.accountbalance += trade.tradebalance
-                elif trade.tradetype == 'Deposit':
-                    # 如果是充值类型，增加账户余额
-                    account.accountbalance -= trade.tradebalance
-                else:
-                    # 对于其他交易类型，如果有特定规则，也可以在此进行调整
-                    pass
-
-                # 更新账户余额
-                account.save()
-
-            # 删除交易记录
-            trade.delete()
+            # 删除交易记录，按需原子地恢复账户余额
+            if not remove_trade(trade, restore_balance):
+                return JsonResponse({
+                    "code": 404,
+                    "message": "交易记录不存在或不是当前用户的记录",
+                    "data": {}
+                })
+            cache.bump_version(request.user.id)
 
             return JsonResponse({
                 "code": 200,
                 "message": "交易记录删除成功",
                 "data": {
                     "trade_id": trade_id,
-                    "account_name": account.accountname,
+                    "account_name": trade.account.accountname,
                     "restore_balance": restore_balance
                 }
             })
@@ -185,30 +317,56 @@ def delete_trade(request):
 
 @csrf_exempt
 @login_required
+@condition(etag_func=cache.user_etag('get_trades'))
 def get_trades(request):
     if request.method == 'GET':
         try:
-            # 获取当前用户的所有交易记录
-            trades = Trade.objects.filter(account__user=request.user)
-
-            # 构造返回数据
-            trade_data = []
-            for trade in trades:
-                trade_data.append({
-                    "id": trade.id,
-                    "account_name": trade.account.accountname,
-                    "budget_name": trade.budget.budgetname if trade.budget else None,
-                    "tradetype": trade.tradetype,
-                    "tradebalance": str(trade.tradebalance),
-                    "traderemark": trade.traderemark
-                })
+            query = _parse_trades_query(request.GET)
+        except _InvalidQuery as e:
+            return JsonResponse({
+                "code": 400,
+                "message": str(e),
+                "data": {}
+            })
 
+        try:
+            rows = list(_trades_page(request.user, *query))
+            return JsonResponse(_trades_page_payload(rows, *query))
+
+        except Exception as e:
             return JsonResponse({
-                "code": 200,
-                "message": "交易记录查询成功",
-                "data": trade_data
+                "code": 500,
+                "message": f"服务器错误: {str(e)}",
+                "data": {}
+            })
+    else:
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 GET 请求",
+            "data": {}
+        })
+
+
+@csrf_exempt
+@login_required
+@cache.async_user_etag('get_trades')
+async def get_trades_async(request):
+    # get_trades 的原生异步版本，供 ASGI 部署使用
+    if request.method == 'GET':
+        try:
+            query = _parse_trades_query(request.GET)
+        except _InvalidQuery as e:
+            return JsonResponse({
+                "code": 400,
+                "message": str(e),
+                "data": {}
             })
 
+        try:
+            user = await request.auser()
+            rows = [row async for row in _trades_page(user, *query)]
+            return JsonResponse(_trades_page_payload(rows, *query))
+
         except Exception as e:
             return JsonResponse({
                 "code": 500,
@@ -221,3 +379,341 @@ def get_trades(request):
             "message": "仅支持 GET 请求",
             "data": {}
         })
+
+
+class _InvalidQuery(ValueError):
+    pass
+
+
+def _parse_trades_query(params):
+    # 解析分页参数：cursor 为上一页返回的 next_cursor，limit 为每页条数
+    try:
+        after_id = _decode_cursor(params.get('cursor'))
+        limit = int(params.get('limit', TRADE_PAGE_SIZE))
+    except ValueError:
+        raise _InvalidQuery("无效的分页参数")
+    limit = max(1, min(limit, TRADE_PAGE_SIZE_MAX))
+    try:
+        time_range = _parse_time_range(params)
+    except ValueError:
+        raise _InvalidQuery("无效的时间范围")
+
+    # 解析字段投影参数，只查询请求的列
+    fields = params.get('fields')
+    if fields:
+        fields = [field.strip() for field in fields.split(',') if field.strip()]
+        invalid = TRADE_SERIALIZER.validate(fields)
+        if invalid:
+            raise _InvalidQuery(f"无效的字段: {', '.join(invalid)}")
+    else:
+        fields = list(TRADE_SERIALIZER.fields)
+    return after_id, limit, fields, time_range
+
+
+def _trades_page(user, after_id, limit, fields, time_range):
+    # 按主键做游标分页，每次多取一条用于判断是否还有下一页
+    trades = Trade.objects.filter(account__user=user, account__deleting=False, **time_range)
+    if after_id is not None:
+        trades = trades.filter(id__gt=after_id)
+    return TRADE_SERIALIZER.values(trades.order_by('id'), fields, extra=['id'])[:limit + 1]
+
+
+def _trades_page_payload(rows, after_id, limit, fields, time_range):
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['id'])
+
+    return {
+        "code": 200,
+        "message": "交易记录查询成功",
+        "data": [TRADE_SERIALIZER.to_dict(row, fields) for row in rows],
+        "next_cursor": next_cursor
+    }
+
+
+def _parse_time_range(params):
+    # since 为起始时间（含），until 为结束时间（不含），均支持日期或 ISO 8601 时间
+    time_range = {}
+    for param, lookup in (('since', 'created_at__gte'), ('until', 'created_at__lt')):
+        value = params.get(param)
+        if value:
+            time_range[lookup] = _parse_time(value)
+    return time_range
+
+
+def _parse_time(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _invalid_time_range():
+    return JsonResponse({
+        "code": 400,
+        "message": "无效的时间范围",
+        "data": {}
+    })
+
+
+def _encode_cursor(trade_id):
+    # 游标对客户端不透明，内部为最后一条记录的主键
+    return base64.urlsafe_b64encode(str(trade_id).encode()).decode()
+
+
+def _decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (UnicodeError, TypeError) as e:
+        raise ValueError(cursor) from e
+
+
+@csrf_exempt
+@login_required
+def export_trades(request):
+    if request.method != 'GET':
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 GET 请求",
+            "data": {}
+        })
+
+    export_format = request.GET.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return JsonResponse({
+            "code": 400,
+            "message": "导出格式仅支持 ndjson 或 csv",
+            "data": {}
+        })
+
+    try:
+        time_range = _parse_time_range(request.GET)
+    except ValueError:
+        return _invalid_time_range()
+
+    # 使用服务端游标分批读取，内存占用与交易总数无关
+    trades = Trade.objects.filter(account__user=request.user, account__deleting=False, **time_range).order_by('id')
+    rows = TRADE_SERIALIZER.values(trades).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        response = StreamingHttpResponse(_csv_lines(rows), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="trades.csv"'
+    else:
+        response = StreamingHttpResponse(_ndjson_lines(rows), content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="trades.ndjson"'
+    return response
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(TRADE_SERIALIZER.to_dict(row), ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    # csv.writer 需要一个文件对象，这里直接返回写入的内容供流式输出
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    fields = list(TRADE_SERIALIZER.fields)
+    yield writer.writerow(fields)
+    for row in rows:
+        item = TRADE_SERIALIZER.to_dict(row)
+        yield writer.writerow([item[field] for field in fields])
+
+
+@csrf_exempt
+@login_required
+def trade_summary(request):
+    if request.method != 'GET':
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 GET 请求",
+            "data": {}
+        })
+
+    group_by = [group.strip() for group in request.GET.get('group_by', '').split(',') if group.strip()]
+    invalid = [group for group in group_by if group not in SUMMARY_GROUPS]
+    if invalid:
+        return JsonResponse({
+            "code": 400,
+            "message": f"无效的分组维度: {', '.join(invalid)}",
+            "data": {}
+        })
+
+    try:
+        time_range = _parse_time_range(request.GET)
+    except ValueError:
+        return _invalid_time_range()
+
+    columns = {}
+    for group in dict.fromkeys(group_by):
+        columns.update(SUMMARY_GROUPS[group])
+
+    # 在数据库中 GROUP BY 聚合，只返回每组的汇总值
+    trades = Trade.objects.filter(account__user=request.user, account__deleting=False, **time_range)
+    aggregates = {"total": Sum('tradebalance'), "count": Count('id'), "average": Avg('tradebalance')}
+    if columns:
+        rows = trades.values(*columns.values()).annotate(**aggregates).order_by(*columns.values())
+    else:
+        rows = [trades.aggregate(**aggregates)]
+
+    summary = []
+    for row in rows:
+        item = {name: row[column] for name, column in columns.items()}
+        item["total"] = str(money(row["total"]))
+        item["count"] = row["count"]
+        item["average"] = str(money(row["average"]))
+        summary.append(item)
+
+    return JsonResponse({
+        "code": 200,
+        "message": "交易统计查询成功",
+        "data": summary
+    })
+
+
+@csrf_exempt
+@login_required
+def spending_report(request):
+    if request.method != 'GET':
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 GET 请求",
+            "data": {}
+        })
+
+    period = request.GET.get('period', 'month')
+    if period not in REPORT_PERIODS:
+        return JsonResponse({
+            "code": 400,
+            "message": "无效的周期粒度",
+            "data": {}
+        })
+
+    group_by = [group.strip() for group in request.GET.get('group_by', 'tradetype').split(',') if group.strip()]
+    invalid = [group for group in group_by if group not in SUMMARY_GROUPS]
+    if invalid:
+        return JsonResponse({
+            "code": 400,
+            "message": f"无效的分组维度: {', '.join(invalid)}",
+            "data": {}
+        })
+
+    # since/until 为日期，按周期起始日期过滤（since 含，until 不含）
+    date_range = {}
+    for param, lookup in (('since', 'period_start__gte'), ('until', 'period_start__lt')):
+        value = request.GET.get(param)
+        if value:
+            try:
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                return _invalid_time_range()
+            date_range[lookup] = day
+
+    columns = {}
+    for group in dict.fromkeys(group_by):
+        columns.update(SUMMARY_GROUPS[group])
+
+    # 只读取预聚合的汇总表，扫描行数取决于周期数与分组数，与交易笔数无关
+    rows = TradeRollup.objects.filter(
+        user=request.user, account__deleting=False, period=period, trade_count__gt=0, **date_range
+    ).values('period_start', *columns.values()).annotate(
+        total=Sum('total'), count=Sum('trade_count')
+    ).order_by('period_start', *columns.values())
+
+    report = []
+    for row in rows:
+        item = {"period": row["period_start"].strftime(REPORT_PERIODS[period])}
+        item.update({name: row[column] for name, column in columns.items()})
+        item["total"] = str(money(row["total"]))
+        item["count"] = row["count"]
+        report.append(item)
+
+    return JsonResponse({
+        "code": 200,
+        "message": "消费报表查询成功",
+        "data": report
+    })
+
+
+@csrf_exempt
+@login_required
+def spending_trend(request):
+    if request.method != 'GET':
+        return JsonResponse({
+            "code": 405,
+            "message": "仅支持 GET 请求",
+            "data": {}
+        })
+
+    period = request.GET.get('period', 'month')
+    if period not in analytics.PERIOD_UNITS:
+        return JsonResponse({
+            "code": 400,
+            "message": "无效的周期粒度",
+            "data": {}
+        })
+
+    try:
+        window = int(request.GET.get('window', 3))
+        horizon = int(request.GET.get('horizon', 3))
+        budget_id = request.GET.get('budget_id')
+        budget_id = int(budget_id) if budget_id else None
+    except ValueError:
+        return JsonResponse({
+            "code": 400,
+            "message": "无效的参数",
+            "data": {}
+        })
+    if window < 1 or not 0 <= horizon <= TREND_HORIZON_MAX:
+        return JsonResponse({
+            "code": 400,
+            "message": "无效的参数",
+            "data": {}
+        })
+
+    # since/until 为日期，默认取截至今天的最近 12 个周期，范围按整周期对齐
+    try:
+        until = request.GET.get('until')
+        until = parse_date(until) if until else timezone.localdate()
+        since = request.GET.get('since')
+        since = parse_date(since) if since else until and analytics.default_start(until, period)
+    except ValueError:
+        return _invalid_time_range()
+    if since is None or until is None or since > until:
+        return _invalid_time_range()
+    start, end = analytics.period_range(since, until, period)
+    if analytics.period_count(start, end, period) > TREND_PERIODS_MAX:
+        return JsonResponse({
+            "code": 400,
+            "message": f"时间范围最多 {TREND_PERIODS_MAX} 个周期",
+            "data": {}
+        })
+
+    trades = analytics.user_trades(request.user, start, end, budget_id, request.GET.get('tradetype') or None)
+    result = analytics.trend(analytics.load_columns(trades), period, start, end, window, horizon)
+
+    budget_names = dict(Budget.objects.filter(
+        id__in={group["budget_id"] for group in result["groups"]}
+    ).values_list('id', 'budgetname'))
+    for group in result["groups"]:
+        group["budget_name"] = budget_names.get(group["budget_id"])
+
+    return JsonResponse({
+        "code": 200,
+        "message": "消费趋势查询成功",
+        "data": result
+    })
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class UserproConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'userpro'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+def _user_cache():
+    # 进程内缓存无法在其他进程中失效，未显式允许时不缓存用户，见 settings.AUTH_CACHE_ALIAS
+    cache = caches[settings.AUTH_CACHE_ALIAS]
+    if isinstance(cache, LocMemCache) and not settings.AUTH_CACHE_ALLOW_LOCAL:
+        return None
+    return cache
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def evict_user(user_id):
+    cache = _user_cache()
+    if cache is not None:
+        cache.delete(user_cache_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    带用户缓存的认证后端。
+
+    配合 cached_db 会话，已登录请求在缓存命中时不再查询会话表和用户表。
+    用户资料保存（包括 is_active、密码变更）或退出登录时由 userpro.signals 清除缓存；
+    AUTH_CACHE_ALIAS 为进程内缓存且未设置 AUTH_CACHE_ALLOW_LOCAL 时不缓存，每次查询用户表。
+    """
+
+    def get_user(self, user_id):
+        cache = _user_cache()
+        if cache is None:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,55 @@
+"""
+成本参数可配置的密码哈希器。
+
+算法名与 Django 内置哈希器一致，已存储的哈希可以直接校验；成本参数从
+settings.PASSWORD_HASHER_COST 读取。登录校验成功后，如果已存哈希的算法或成本参数
+与当前策略不同，check_password 会自动按当前策略重新哈希（升级或降级）。
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _cost(name, default):
+    return getattr(settings, 'PASSWORD_HASHER_COST', {}).get(name, default)
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _cost('pbkdf2_iterations', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _cost('scrypt_work_factor', hashers.ScryptPasswordHasher.work_factor)
+
+    @property
+    def block_size(self):
+        return _cost('scrypt_block_size', hashers.ScryptPasswordHasher.block_size)
+
+    @property
+    def parallelism(self):
+        return _cost('scrypt_parallelism', hashers.ScryptPasswordHasher.parallelism)
+
+    @property
+    def maxmem(self):
+        # OpenSSL 默认最多使用 32 MiB，提高成本参数后会报 memory limit exceeded；
+        # 按当前参数所需内存 128·r·(n + p + 2) 留出一倍余量，且不低于默认上限，以便校验旧的哈希
+        needed = 128 * self.block_size * (self.work_factor + self.parallelism + 2)
+        return max(2 * needed, 32 * 1024 * 1024)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # 需要安装 argon2-cffi
+    @property
+    def time_cost(self):
+        return _cost('argon2_time_cost', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _cost('argon2_memory_cost', hashers.Argon2PasswordHasher.memory_cost)
+
+    @property
+    def parallelism(self):
+        return _cost('argon2_parallelism', hashers.Argon2PasswordHasher.parallelism)
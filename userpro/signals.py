@@ -0,0 +1,19 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .backends import evict_user
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def evict_cached_user(sender, instance, **kwargs):
+    # 用户资料变化（包括禁用账号、修改密码）后立即清除认证缓存
+    evict_user(instance.pk)
+
+
+@receiver(user_logged_out)
+def evict_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        evict_user(user.pk)
@@ -1,3 +1,123 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from FinanceManageSystem.testing import local_auth_cache
+from .backends import user_cache_key
+
+User = get_user_model()
+
+
+@local_auth_cache
+class CachedAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='alice', password='secret-pw')
+        self.client.post('/userpro/login/', json.dumps({'username': 'alice', 'password': 'secret-pw'}),
+                         content_type='application/json')
+
+    def test_authenticated_request_is_query_free_on_cache_hit(self):
+        self.assertEqual(self.client.get('/userpro/get_user_info/').json()['code'], 200)
+        with self.assertNumQueries(0):
+            body = self.client.get('/userpro/get_user_info/').json()
+        self.assertEqual(body['data']['username'], 'alice')
+
+    def test_deactivated_user_is_rejected_immediately(self):
+        self.client.get('/userpro/get_user_info/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/userpro/get_user_info/').status_code, 302)
+
+    def test_logout_revokes_session(self):
+        self.client.get('/userpro/get_user_info/')
+        session_key = self.client.session.session_key
+        self.client.get('/userpro/logout/')
+        self.assertEqual(self.client.get('/userpro/get_user_info/').status_code, 302)
+        # 旧会话凭证重放也无效
+        self.client.cookies['sessionid'] = session_key
+        self.assertEqual(self.client.get('/userpro/get_user_info/').status_code, 302)
+
+
+class ProcessLocalAuthCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='bob', password='secret-pw')
+        self.client.force_login(self.user)
+
+    def test_user_is_not_cached_in_process_local_cache_by_default(self):
+        # 其他进程无法清除本进程的缓存，默认不把用户放进 LocMem
+        self.assertEqual(self.client.get('/userpro/get_user_info/').json()['code'], 200)
+        self.assertIsNone(cache.get(user_cache_key(self.user.id)))
+        User.objects.filter(id=self.user.id).update(is_active=False)
+        self.assertEqual(self.client.get('/userpro/get_user_info/').status_code, 302)
+
+
+# 测试中使用低成本参数，避免密码哈希拖慢用例
+LOW_COST = {'pbkdf2_iterations': 1000, 'scrypt_work_factor': 2 ** 4, 'scrypt_block_size': 8,
+            'scrypt_parallelism': 1}
+PBKDF2_FIRST = ['userpro.hashers.PBKDF2PasswordHasher', 'userpro.hashers.ScryptPasswordHasher']
+SCRYPT_FIRST = ['userpro.hashers.ScryptPasswordHasher', 'userpro.hashers.PBKDF2PasswordHasher']
+
+
+@override_settings(PASSWORD_HASHER_COST=LOW_COST)
+class PasswordRehashTests(TestCase):
+    def login(self, password='secret-pw'):
+        return self.client.post('/userpro/login/', json.dumps({'username': 'bob', 'password': password}),
+                                content_type='application/json').json()
+
+    def test_login_upgrades_hash_to_current_algorithm(self):
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = User.objects.create_user(username='bob', password='secret-pw')
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+        with self.settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertEqual(self.login()['code'], 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('scrypt$'))
+
+    def test_login_rehashes_when_cost_changes(self):
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = User.objects.create_user(username='bob', password='secret-pw')
+            # 降低成本（如吞吐调优）同样会在下次登录时重新哈希
+            with self.settings(PASSWORD_HASHER_COST={**LOW_COST, 'pbkdf2_iterations': 500}):
+                self.assertEqual(self.login()['code'], 200)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$500$'))
+
+    def test_failed_login_keeps_stored_hash(self):
+        with self.settings(PASSWORD_HASHERS=PBKDF2_FIRST):
+            user = User.objects.create_user(username='bob', password='secret-pw')
+        with self.settings(PASSWORD_HASHERS=SCRYPT_FIRST):
+            self.assertEqual(self.login('wrong')['code'], 401)
+        encoded = user.password
+        user.refresh_from_db()
+        self.assertEqual(user.password, encoded)
+
+    def test_scrypt_work_factor_above_default_memory_limit(self):
+        # n=2^15, r=8 需要 32 MiB 以上内存，超过 OpenSSL 的默认上限
+        with self.settings(PASSWORD_HASHERS=SCRYPT_FIRST,
+                           PASSWORD_HASHER_COST={**LOW_COST, 'scrypt_work_factor': 2 ** 15}):
+            encoded = make_password('secret-pw')
+            self.assertTrue(encoded.startswith('scrypt$32768$'))
+            self.assertTrue(check_password('secret-pw', encoded))
+
+    def test_login_looks_up_user_once(self):
+        User.objects.create_user(username='bob', password='secret-pw')
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.login()['code'], 200)
+        lookups = [query for query in ctx if query['sql'].startswith('SELECT') and '"userpro_user"' in query['sql']]
+        self.assertEqual(len(lookups), 1)
+
+    def test_login_failure_messages(self):
+        user = User.objects.create_user(username='bob', password='secret-pw')
+        self.assertEqual(self.login('wrong')['message'], '密码错误')
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.login()['code'], 403)
+        self.assertEqual(self.login('wrong')['code'], 401)
+        user.delete()
+        self.assertEqual(self.login()['message'], '用户不存在')
@@ -6,5 +6,6 @@ urlpatterns = [
     path('login/', views.login, name='login'),
     path('update_profile/', views.update_profile, name='update_profile'),
     path('get_user_info/', views.get_user_info, name='get_user_info'),
+    path('get_user_info_async/', views.get_user_info_async, name='get_user_info_async'),
     path('logout/', views.logout_user, name='logout'),
 ]
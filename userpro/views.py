@@ -62,26 +62,24 @@ def login(request):
             username = data.get('username')
             password = data.get('password')
 
-            # 查找用户
-            try:
-                user = User.objects.get(username=username)
-            except User.DoesNotExist:
-                return JsonResponse({
-                    "code": 401,
-                    "message": "用户不存在",
-                    "data": {}
-                })
-
-            # 检查密码是否正确
-            if not user.check_password(password):
-                return JsonResponse({
-                    "code": 401,
-                    "message": "密码错误",
-                    "data": {}
-                })
-
-            # 检查用户是否被禁用
-            if not user.is_active:
+            # authenticate 一次查询取回用户并校验密码，哈希参数变化时同时升级已存储的哈希
+            user = authenticate(request, username=username, password=password)
+            if user is None:
+                # 只在登录失败时再查一次，区分用户不存在、密码错误和账号被禁用
+                user = User.objects.filter(username=username).first()
+                if user is None:
+                    return JsonResponse({
+                        "code": 401,
+                        "message": "用户不存在",
+                        "data": {}
+                    })
+                # 认证后端拒绝已禁用用户，只有禁用用户需要再校验一次密码
+                if user.is_active or not user.check_password(password):
+                    return JsonResponse({
+                        "code": 401,
+                        "message": "密码错误",
+                        "data": {}
+                    })
                 return JsonResponse({
                     "code": 403,
                     "message": "资金异常，账号已冻结，请联系管理员",
@@ -184,7 +182,17 @@ def get_user_info(request):
             "data": {}
         })
 
-    user = request.user
+    return JsonResponse(_user_info_payload(request.user))
+
+
+@login_required
+@csrf_exempt
+async def get_user_info_async(request):
+    # get_user_info 的原生异步版本，供 ASGI 部署使用
+    return JsonResponse(_user_info_payload(await request.auser()))
+
+
+def _user_info_payload(user):
     user_info = {
         "username": user.username,
         "email": user.email,
@@ -193,11 +201,11 @@ def get_user_info(request):
         "gender": user.gender
     }
 
-    return JsonResponse({
+    return {
         "code": 200,
         "message": "获取用户信息成功",
         "data": user_info
-    })
+    }
 
 
 @login_required